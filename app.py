@@ -1,51 +1,172 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, session, abort, make_response, g, has_request_context, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.http import is_resource_modified
+from abc import ABC, abstractmethod
 from functools import wraps
-from datetime import datetime
-from sqlalchemy import or_
+from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from sqlalchemy import or_, and_, func, update, case, union_all, bindparam, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import aliased, contains_eager, joinedload
 import random
 import math
+import mimetypes
+import base64
+import bisect
+import click
+import contextlib
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from jinja2 import FileSystemBytecodeCache
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tournament.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+# Маршруты, обработчики запросов и команды приложения; create_app регистрирует их
+bp = Blueprint('main', __name__, cli_group=None)
+
+def load_config(app, config=None):
+    """Настройки по умолчанию (часть - из окружения), поверх них - config"""
+    app.config['SECRET_KEY'] = 'your-secret-key-here'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///tournament.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Кэш страниц турнирной сетки: как часто сверять версию с базой и сколько страниц хранить
+    app.config['BRACKET_CACHE_TTL'] = 2
+    app.config['BRACKET_CACHE_SIZE'] = 256
+    # Интервал служебных сообщений в потоке живых обновлений сетки, секунд
+    app.config['SSE_HEARTBEAT'] = 15
+    # Профилирование запросов (включается переменной окружения PROFILING=1):
+    # запросы дольше SLOW_REQUEST_MS пишутся в журнал медленных запросов
+    app.config['PROFILING'] = os.environ.get('PROFILING') == '1'
+    app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    app.config['SLOW_LOG_FILE'] = os.environ.get('SLOW_LOG_FILE')
+    app.config['PROFILING_TOP_STATEMENTS'] = 5
+    # Режим базы для конкурентной работы: WAL и synchronous=NORMAL для SQLite
+    # (SQLITE_WAL=0 возвращает журнал по умолчанию), ожидание блокировки, размер пула
+    # и число повторов пишущих транзакций при конфликте блокировок
+    app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    app.config['WRITE_RETRIES'] = int(os.environ.get('WRITE_RETRIES', 3))
+    # Круговой турнир на n участников - это n(n-1)/2 матчей, поэтому размер ограничен
+    app.config['ROUND_ROBIN_MAX_PARTICIPANTS'] = 128
+    # Сжатие ответов: уровень gzip/brotli и минимальный размер тела, которое стоит сжимать
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    # Срок кэширования статических файлов с хэшем содержимого в имени, секунд
+    app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600
+    # Каталог кэша байткода шаблонов (по умолчанию - временный каталог пользователя)
+    app.config['JINJA_CACHE_DIR'] = os.environ.get('JINJA_CACHE_DIR')
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+def engine_options(config):
+    """Параметры движка: пул для файловой SQLite и серверных СУБД, таймаут драйвера"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        if ':memory:' in uri or uri.rstrip('/') == 'sqlite:':
+            return {}
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000},
+        }
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
 
 # Модели данных
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_created_at', 'created_at', 'id'),
+        # Поиск участников с фильтром по метке в порядке имени
+        db.Index('ix_user_tag_name', 'tag', 'name', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     tag = db.Column(db.String(50), nullable=True)  # Метка для группировки участников
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Tournament(db.Model):
+    __table_args__ = (
+        # Списки турниров выводятся страницами по (created_at, id)
+        db.Index('ix_tournament_created_at', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='active')  # active, completed
+    # Версия сетки увеличивается при каждом изменении результатов (для кэша и ETag)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Формат проведения (ключ TOURNAMENT_FORMATS) и число туров для швейцарской системы и круга
+    format = db.Column(db.String(20), default='single_elimination', nullable=False)
+    rounds_total = db.Column(db.Integer, nullable=True)
+    # Победитель по итоговой таблице (в олимпийской системе победитель - финалист)
+    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    
+    # Связи
+    winner = db.relationship('User', foreign_keys=[winner_id])
 
 class Match(db.Model):
+    __table_args__ = (
+        # Сетка турнира и матчи раунда выбираются по (tournament_id, round_number[, is_completed])
+        db.Index('ix_match_tournament_round', 'tournament_id', 'round_number', 'is_completed'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
     round_number = db.Column(db.Integer, nullable=False)
-    player1_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    player2_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    player1_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    player2_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     is_completed = db.Column(db.Boolean, default=False)
+    # Положение матча в сетке: номер слота внутри раунда и куда уходит победитель
+    position = db.Column(db.Integer)
+    next_match_id = db.Column(db.Integer, db.ForeignKey('match.id'))
+    next_slot = db.Column(db.Integer)  # 1 - player1, 2 - player2
+    is_bye = db.Column(db.Boolean, default=False)  # Матч с единственным участником
     
     # Связи
     tournament = db.relationship('Tournament', backref=db.backref('matches', lazy=True))
     player1 = db.relationship('User', foreign_keys=[player1_id], backref='matches_as_player1')
     player2 = db.relationship('User', foreign_keys=[player2_id], backref='matches_as_player2')
     winner = db.relationship('User', foreign_keys=[winner_id], backref='matches_won')
+    next_match = db.relationship('Match', remote_side=[id], foreign_keys=[next_match_id])
 
 class TournamentParticipant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
     tournament = db.relationship('Tournament', backref=db.backref('participants', lazy=True))
     user = db.relationship('User', backref=db.backref('tournament_participations', lazy=True))
@@ -62,121 +183,990 @@ class AdminUser(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class UserStats(db.Model):
+    """Сводная статистика участника по сыгранным матчам.
+    
+    Обновляется приращениями вместе с результатами (set_winner) и удалениями
+    (delete_tournament, force_delete_user); пересчет с нуля - flask rebuild-stats.
+    Матчи с bye не считаются сыгранными.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    matches_played = db.Column(db.Integer, default=0, nullable=False)
+    wins = db.Column(db.Integer, default=0, nullable=False, index=True)
+    tournaments_won = db.Column(db.Integer, default=0, nullable=False, index=True)
+
+class TournamentArchive(db.Model):
+    """Снимок завершенного турнира: сетка, имена и названия раундов одним сжатым JSON.
+    
+    Страница архивного турнира отрисовывается из снимка без обращения к матчам.
+    rows_removed - матчи турнира удалены из рабочих таблиц, их возвращает
+    restore_tournament. Строки участников остаются (вместе с игроками матчей
+    снимка): по ним проверки удаления участников видят, кого вернет восстановление.
+    """
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    rows_removed = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SchemaVersion(db.Model):
+    """Примененные миграции схемы базы данных"""
+    version = db.Column(db.Integer, primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Декоратор для проверки авторизации администратора
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'admin_logged_in' not in session or not session['admin_logged_in']:
+            if request.path.startswith('/api/'):
+                return jsonify(error='Требуется вход администратора'), 401
             flash('Для доступа к админ-панели необходимо войти в систему', 'error')
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('main.admin_login'))
         return f(*args, **kwargs)
     return decorated_function
 
+# Конкурентная запись. Для SQLite соединения переводятся в WAL (читатели не блокируют
+# писателя), ждут блокировку до SQLITE_BUSY_TIMEOUT_MS, а пишущие маршруты начинают
+# транзакцию с BEGIN IMMEDIATE: блокировка записи берется сразу, а не при первом
+# UPDATE, поэтому две транзакции не упираются друг в друга посреди работы. Если
+# блокировку получить не удалось, маршрут повторяется целиком. На серверных СУБД
+# прагмы не применяются, а повторяются транзакции с ошибкой сериализации или дедлоком.
+def configure_sqlite_engine(engine, config):
+    """Прагмы новых соединений SQLite движка приложения (вызывает create_app)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    busy_timeout = int(config['SQLITE_BUSY_TIMEOUT_MS'])
+    wal = config['SQLITE_WAL']
+    
+    @event.listens_for(engine, 'connect')
+    def configure_connection(dbapi_connection, connection_record):
+        # BEGIN выдает обработчик _begin_sqlite_transaction, а не драйвер
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+        if wal:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+
+@event.listens_for(Engine, 'begin')
+def _begin_sqlite_transaction(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    immediate = has_request_context() and g.get('write_transaction', False)
+    conn.exec_driver_sql('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+
+def is_contention_error(error):
+    """Ошибка из-за конкурентной записи, после которой транзакцию можно повторить"""
+    orig = getattr(error, 'orig', error)
+    if isinstance(orig, sqlite3.OperationalError):
+        message = str(orig)
+        return 'database is locked' in message or 'database is busy' in message
+    # PostgreSQL: ошибка сериализации и дедлок; MySQL: таймаут блокировки и дедлок
+    if (getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)) in ('40001', '40P01'):
+        return True
+    args = getattr(orig, 'args', ())
+    return bool(args) and args[0] in (1205, 1213)
+
+def write_transaction(f):
+    """Пишущий маршрут: сразу берет блокировку записи и повторяется при конфликте"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.write_transaction = request.method != 'GET'
+        retries = current_app.config['WRITE_RETRIES']
+        for attempt in itertools.count():
+            try:
+                return f(*args, **kwargs)
+            except OperationalError as e:
+                db.session.rollback()
+                if attempt >= retries or not is_contention_error(e):
+                    raise
+                # Экспоненциальная пауза со случайной добавкой, чтобы повторы разошлись
+                time.sleep(0.05 * 2 ** attempt * (1 + random.random()))
+    return decorated_function
+
+@bp.app_errorhandler(OperationalError)
+def handle_database_busy(error):
+    if not is_contention_error(error):
+        raise error
+    message = 'База данных занята, повторите запрос'
+    if request.path.startswith('/api/'):
+        response = jsonify(error=message)
+    else:
+        response = make_response(message)
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+# Профилирование: время запроса, время и число SQL-запросов, самые медленные
+# запросы с местом вызова. Данные запроса лежат в g.profile, сводка по маршрутам -
+# в памяти процесса и видна на /admin/profiling.
+PROFILE_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+slow_log = logging.getLogger('tournament.slow')
+
+class RequestProfiler:
+    """Сводная статистика по маршрутам: гистограмма времени и суммы по SQL"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+    
+    def record(self, route, wall_ms, sql_ms, statements):
+        bucket = bisect.bisect_left(PROFILE_BUCKETS_MS, wall_ms)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    'count': 0, 'wall_ms': 0.0, 'max_ms': 0.0, 'sql_ms': 0.0, 'statements': 0,
+                    'histogram': [0] * (len(PROFILE_BUCKETS_MS) + 1),
+                }
+            stats['count'] += 1
+            stats['wall_ms'] += wall_ms
+            stats['max_ms'] = max(stats['max_ms'], wall_ms)
+            stats['sql_ms'] += sql_ms
+            stats['statements'] += statements
+            stats['histogram'][bucket] += 1
+    
+    def snapshot(self):
+        with self._lock:
+            routes = {route: dict(stats, histogram=list(stats['histogram'])) for route, stats in self._routes.items()}
+        for stats in routes.values():
+            stats['p50_ms'] = self._percentile(stats, 0.5)
+            stats['p95_ms'] = self._percentile(stats, 0.95)
+        return routes
+    
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+    
+    @staticmethod
+    def _percentile(stats, fraction):
+        """Оценка перцентиля по гистограмме - верхняя граница корзины"""
+        target = stats['count'] * fraction
+        seen = 0
+        for bucket, count in enumerate(stats['histogram']):
+            seen += count
+            if seen >= target and count:
+                return PROFILE_BUCKETS_MS[bucket] if bucket < len(PROFILE_BUCKETS_MS) else stats['max_ms']
+        return 0
+
+request_profiler = RequestProfiler()
+
+def _call_site():
+    """Ближайший к SQL-запросу кадр кода приложения (app.py или шаблона)"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(current_app.root_path) and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, current_app.root_path)}:{frame.f_lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'profile' in g:
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('profile_started')
+    if not started or not has_request_context() or 'profile' not in g:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    profile = g.profile
+    profile['sql_ms'] += elapsed_ms
+    profile['statements'] += 1
+    
+    # Место вызова ищем только для кандидатов в самые медленные
+    slowest = profile['slowest']
+    limit = current_app.config['PROFILING_TOP_STATEMENTS']
+    if len(slowest) < limit or elapsed_ms > slowest[0][0]:
+        entry = (elapsed_ms, profile['statements'], ' '.join(statement.split())[:300], _call_site())
+        if len(slowest) < limit:
+            heapq.heappush(slowest, entry)
+        else:
+            heapq.heapreplace(slowest, entry)
+
+@bp.before_app_request
+def start_request_profile():
+    if current_app.config['PROFILING']:
+        g.profile = {'started': time.perf_counter(), 'sql_ms': 0.0, 'statements': 0, 'slowest': []}
+
+@bp.after_app_request
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    
+    wall_ms = (time.perf_counter() - profile['started']) * 1000
+    route = f'{request.method} {request.url_rule.rule if request.url_rule else "<404>"}'
+    request_profiler.record(route, wall_ms, profile['sql_ms'], profile['statements'])
+    
+    if wall_ms >= current_app.config['SLOW_REQUEST_MS']:
+        slow_log.warning(json.dumps({
+            'time': datetime.utcnow().isoformat(),
+            'route': route,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 2),
+            'sql_ms': round(profile['sql_ms'], 2),
+            'statements': profile['statements'],
+            'slowest': [
+                {'ms': round(ms, 2), 'sql': sql, 'site': site}
+                for ms, _, sql, site in sorted(profile['slowest'], reverse=True)
+            ],
+        }, ensure_ascii=False))
+    return response
+
+def add_slow_log_file(path):
+    """Журнал медленных запросов в файл path (один обработчик на файл в процессе)"""
+    path = os.path.abspath(path)
+    if any(getattr(handler, 'baseFilename', None) == path for handler in slow_log.handlers):
+        return
+    handler = logging.FileHandler(path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_log.addHandler(handler)
+
+# Статические файлы и сжатие ответов. Общие стили и скрипты лежат в static/ и
+# подключаются по адресу с хэшем содержимого (app.1a2b3c4d5e6f.css): такой адрес
+# меняется вместе с файлом, поэтому браузер кэширует его на год и не перепроверяет.
+# Текстовые ответы сжимаются gzip (или brotli, если установлен пакет brotli).
+# Скомпилированные шаблоны кэшируются на диске (FileSystemBytecodeCache, его
+# подключает create_app): новые процессы не разбирают их заново.
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson', 'image/svg+xml',
+}
+
+_assets = {}
+_assets_lock = threading.Lock()
+
+def load_asset(path):
+    """Содержимое и хэш статического файла; перечитывается, только если файл изменился"""
+    full_path = safe_join(current_app.static_folder, path)
+    if full_path is None or not os.path.isfile(full_path):
+        return None
+    mtime = os.stat(full_path).st_mtime_ns
+    with _assets_lock:
+        asset = _assets.get(path)
+        if asset is None or asset[0] != mtime:
+            with open(full_path, 'rb') as f:
+                data = f.read()
+            asset = (mtime, data, hashlib.sha256(data).hexdigest()[:12])
+            _assets[path] = asset
+    return asset
+
+@bp.app_template_global()
+def asset_url(path):
+    """Адрес статического файла с хэшем содержимого в имени"""
+    asset = load_asset(path)
+    if asset is None:
+        return url_for('static', filename=path)
+    stem, ext = os.path.splitext(path)
+    return url_for('main.asset', filename=f'{stem}.{asset[2]}{ext}')
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    # app.1a2b3c4d5e6f.css -> app.css; адрес без хэша тоже отдается, но без долгого кэша
+    stem, ext = os.path.splitext(filename)
+    base, _, digest = stem.rpartition('.')
+    if base and re.fullmatch(r'[0-9a-f]{12}', digest):
+        path = base + ext
+    else:
+        path, digest = filename, None
+    loaded = load_asset(path)
+    if loaded is None:
+        abort(404)
+    _, data, current = loaded
+    
+    response = current_app.response_class(data, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.set_etag(current)
+    if digest == current:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['ASSET_MAX_AGE']
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@bp.after_app_request
+def compress_response(response):
+    """Сжимает текстовые ответы gzip или brotli, если клиент их принимает"""
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding is None:
+        return response
+    
+    level = current_app.config['COMPRESS_LEVEL']
+    if encoding == 'br':
+        body = brotli.compress(body, quality=min(level, 11))
+    else:
+        body = gzip.compress(body, compresslevel=min(level, 9), mtime=0)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # Сжатое тело - другое представление, поэтому строгий ETag становится слабым
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+class BracketCache:
+    """Кэш отрисованных страниц турнирной сетки в памяти процесса.
+    
+    Для каждого турнира хранится последняя известная версия из Tournament.version
+    и время ее проверки. Пока проверка свежая (BRACKET_CACHE_TTL секунд), страница
+    и ответ 304 отдаются без обращения к базе. Изменения в этом процессе сбрасывают
+    версию сразу, изменения из других процессов видны не позже чем через TTL.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}  # tournament_id -> (version, updated_at, checked_at)
+        self._pages = OrderedDict()  # (tournament_id, version, admin) -> html
+    
+    def get_version(self, tournament_id, ttl):
+        with self._lock:
+            state = self._versions.get(tournament_id)
+        if state is None or time.monotonic() - state[2] > ttl:
+            return None
+        return state[0], state[1]
+    
+    def set_version(self, tournament_id, version, updated_at):
+        with self._lock:
+            self._versions[tournament_id] = (version, updated_at, time.monotonic())
+    
+    def get_page(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+    
+    def set_page(self, key, page, max_size):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > max_size:
+                self._pages.popitem(last=False)
+    
+    def invalidate(self, *tournament_ids):
+        with self._lock:
+            for tournament_id in tournament_ids:
+                self._versions.pop(tournament_id, None)
+            stale = [key for key in self._pages if key[0] in tournament_ids]
+            for key in stale:
+                del self._pages[key]
+
+bracket_cache = BracketCache()
+
+def bump_bracket_version(*tournament_ids):
+    """Увеличивает версию сеток в текущей транзакции и возвращает {tournament_id: новая версия}.
+    
+    Кэш процесса нужно сбросить после коммита: bracket_cache.invalidate(...).
+    """
+    if not tournament_ids:
+        return {}
+    # UPDATE ... RETURNING есть не во всех СУБД (в MySQL его нет), поэтому версии
+    # читаются отдельным запросом в той же транзакции
+    db.session.execute(
+        update(Tournament)
+        .where(Tournament.id.in_(tournament_ids))
+        .values(version=Tournament.version + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return dict(db.session.query(Tournament.id, Tournament.version).filter(Tournament.id.in_(tournament_ids)))
+
+class BracketEvents:
+    """Рассылка изменений сетки подписчикам SSE внутри процесса.
+    
+    Канал заводится на пару (турнир, страница администратора или зрителя), пока у
+    нее есть подписчики: короткий журнал событий (версия сетки, готовый JSON) и
+    Condition. Публикация - одно добавление в журнал и notify_all, ее стоимость не
+    зависит от числа зрителей и JSON собирается один раз на канал. Каждое соединение - генератор, который спит на Condition и читает журнал со
+    своей позиции; под gevent-воркером это гринлет, а не отдельный поток ОС.
+    """
+    
+    HISTORY = 32
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}  # (tournament_id, admin) -> [Condition, deque, число подписчиков]
+    
+    def subscribe(self, key):
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = [threading.Condition(), deque(maxlen=self.HISTORY), 0]
+            channel[2] += 1
+            return channel
+    
+    def unsubscribe(self, key):
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is not None:
+                channel[2] -= 1
+                if channel[2] <= 0:
+                    del self._channels[key]
+    
+    def has_subscribers(self, key):
+        return key in self._channels
+    
+    def publish(self, key, version, payload):
+        """payload - строка JSON или None, если подписчикам нужно перезагрузить страницу"""
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        condition, log, _ = channel
+        with condition:
+            log.append((version, payload))
+            condition.notify_all()
+    
+    def wait(self, channel, after, timeout):
+        """Возвращает события новее версии after или пустой список по истечении timeout"""
+        condition, log, _ = channel
+        with condition:
+            if not log or log[-1][0] <= after:
+                condition.wait(timeout)
+            return [event for event in log if event[0] > after]
+
+bracket_events = BracketEvents()
+
+def publish_bracket_update(tournament_id, version, changed_matches, status):
+    """Отправляет подписчикам турнира отрисованные заново измененные матчи.
+    
+    Матчи отрисовываются только для тех каналов (администраторы, зрители), у
+    которых сейчас есть подписчики, и каждый канал получает только свой вариант.
+    """
+    keys = [(tournament_id, admin) for admin in (False, True) if bracket_events.has_subscribers((tournament_id, admin))]
+    if not keys:
+        return
+    if changed_matches is None:
+        for key in keys:
+            bracket_events.publish(key, version, None)
+        return
+    
+    last_round = db.session.query(func.max(Match.round_number)).filter_by(tournament_id=tournament_id).scalar()
+    completed_delta = sum(1 for match in changed_matches if match.is_completed)
+    for key in keys:
+        payload = json.dumps({
+            'version': version,
+            'status': status,
+            'matches': [
+                {'id': match.id, 'html': render_template('_match.html', match=match, last_round=last_round, is_admin=key[1])}
+                for match in changed_matches
+            ],
+            'completed_delta': completed_delta,
+        }, ensure_ascii=False)
+        bracket_events.publish(key, version, payload)
+
+def user_stats_deltas(*criteria, executor=None):
+    """Вклад завершенных матчей, подходящих под criteria, в статистику участников.
+    
+    Возвращает {user_id: (матчей сыграно, побед, выигранных турниров)}. Финал
+    завершенного турнира олимпийской системы - матч без следующего матча; в
+    сетках без слотов - матч последнего раунда, который ищется коррелированным
+    подзапросом по индексу (tournament_id, round_number). Титулы турниров с
+    итоговой таблицей считает standings_title_deltas.
+    executor - сессия или соединение, по умолчанию db.session.
+    """
+    last_match = aliased(Match)
+    last_round = (
+        db.select(func.max(last_match.round_number))
+        .where(last_match.tournament_id == Match.tournament_id)
+        .scalar_subquery()
+    )
+    is_final = case((and_(
+        Tournament.status == 'completed',
+        Tournament.format == 'single_elimination',
+        or_(
+            and_(Match.position.isnot(None), Match.next_match_id.is_(None)),
+            and_(Match.position.is_(None), Match.round_number == last_round)
+        )
+    ), 1), else_=0)
+    matches = (
+        db.select(Match.player1_id, Match.player2_id, Match.winner_id, is_final.label('is_final'))
+        .join(Tournament, Tournament.id == Match.tournament_id)
+        .where(
+            Match.is_completed == True,
+            Match.player1_id.isnot(None),
+            Match.player2_id.isnot(None),
+            *criteria
+        )
+        .subquery()
+    )
+    # Каждый матч дает две строки - по одной на игрока
+    sides = union_all(*[
+        db.select(
+            player.label('user_id'),
+            case((matches.c.winner_id == player, 1), else_=0).label('won'),
+            matches.c.is_final
+        )
+        for player in (matches.c.player1_id, matches.c.player2_id)
+    ]).subquery()
+    rows = (executor or db.session).execute(
+        db.select(sides.c.user_id, func.count(), func.sum(sides.c.won), func.sum(sides.c.won * sides.c.is_final))
+        .group_by(sides.c.user_id)
+    )
+    return {user_id: (played, wins, titles) for user_id, played, wins, titles in rows}
+
+def standings_title_deltas(*criteria, executor=None):
+    """Титулы завершенных турниров, победитель которых записан в Tournament.winner_id"""
+    rows = (executor or db.session).execute(
+        db.select(Tournament.winner_id, func.count())
+        .where(Tournament.status == 'completed', Tournament.winner_id.isnot(None), *criteria)
+        .group_by(Tournament.winner_id)
+    )
+    return {user_id: (0, 0, titles) for user_id, titles in rows}
+
+def merge_stats_deltas(*parts):
+    """Складывает несколько наборов приращений {user_id: (сыграно, побед, титулов)}"""
+    merged = {}
+    for deltas in parts:
+        for user_id, values in deltas.items():
+            merged[user_id] = tuple(a + b for a, b in zip(merged.get(user_id, (0, 0, 0)), values))
+    return merged
+
+def apply_user_stats(deltas, sign=1):
+    """Прибавляет (sign=-1 - вычитает) приращения {user_id: (сыграно, побед, титулов)}.
+    
+    Недостающие строки статистики создаются одним INSERT, затем все изменения
+    применяются одним executemany UPDATE.
+    """
+    if not deltas:
+        return
+    existing = {
+        user_id for (user_id,) in db.session.query(UserStats.user_id).filter(UserStats.user_id.in_(list(deltas)))
+    }
+    missing = [
+        {'user_id': user_id, 'matches_played': 0, 'wins': 0, 'tournaments_won': 0}
+        for user_id in deltas if user_id not in existing
+    ]
+    if missing:
+        db.session.execute(UserStats.__table__.insert(), missing)
+    
+    table = UserStats.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.user_id == bindparam('b_user_id'))
+        .values(
+            matches_played=table.c.matches_played + bindparam('b_played'),
+            wins=table.c.wins + bindparam('b_wins'),
+            tournaments_won=table.c.tournaments_won + bindparam('b_titles'),
+        ),
+        [
+            {'b_user_id': user_id, 'b_played': sign * played, 'b_wins': sign * wins, 'b_titles': sign * titles}
+            for user_id, (played, wins, titles) in deltas.items()
+        ]
+    )
+
+def rebuild_user_stats(executor=None):
+    """Пересчитывает таблицу статистики с нуля по всем матчам. Коммит - за вызывающим."""
+    executor = executor or db.session
+    deltas = merge_stats_deltas(
+        user_stats_deltas(executor=executor),
+        standings_title_deltas(executor=executor),
+        archive_stats_deltas(executor=executor)
+    )
+    executor.execute(UserStats.__table__.delete())
+    if deltas:
+        executor.execute(UserStats.__table__.insert(), [
+            {'user_id': user_id, 'matches_played': played, 'wins': wins, 'tournaments_won': titles}
+            for user_id, (played, wins, titles) in deltas.items()
+        ])
+    return len(deltas)
+
 # Маршруты
-@app.route('/')
+@bp.route('/')
 def index():
-    tournaments = Tournament.query.order_by(Tournament.created_at.desc()).all()
-    return render_template('index.html', tournaments=tournaments)
+    tournaments, next_cursor = keyset_page(
+        db.session.query(*tournament_columns(TOURNAMENT_LIST_FIELDS)),
+        (Tournament.created_at, Tournament.id),
+        request.args.get('cursor')
+    )
+    return render_template('index.html', tournaments=tournaments, next_cursor=next_cursor, formats=TOURNAMENT_FORMATS)
 
-@app.route('/admin')
+@bp.route('/admin')
 @admin_required
 def admin():
-    users = User.query.order_by(User.name).all()
-    tournaments = Tournament.query.order_by(Tournament.created_at.desc()).all()
+    """Админ-панель. Участники не выводятся целиком: таблица и выбор участников
+    турнира подгружаются страницами (admin_users и /api/users), поэтому размер
+    страницы не зависит от их числа."""
+    tournaments, tournaments_cursor = keyset_page(
+        db.session.query(*tournament_columns(TOURNAMENT_LIST_FIELDS)),
+        (Tournament.created_at, Tournament.id),
+        request.args.get('tournaments_cursor')
+    )
+    
+    # Счетчики для текущей страницы - сгруппированными запросами вместо ленивых связей
+    participants_counts = group_counts(TournamentParticipant.tournament_id, [t.id for t in tournaments])
+    matches_counts = group_counts(Match.tournament_id, [t.id for t in tournaments])
+    users_total = db.session.query(func.count(User.id)).scalar()
     
-    # Получаем уникальные метки для фильтрации
+    # Получаем уникальные метки для фильтрации (DISTINCT по индексу ix_user_tag_name)
     tags = db.session.query(User.tag).distinct().filter(User.tag.isnot(None), User.tag != '').all()
     unique_tags = sorted([tag[0] for tag in tags])
     
-    return render_template('admin.html', users=users, tournaments=tournaments, tags=unique_tags)
+    return render_template(
+        'admin.html',
+        users_total=users_total,
+        tournaments=tournaments, tournaments_cursor=tournaments_cursor,
+        participants_counts=participants_counts, matches_counts=matches_counts,
+        tags=unique_tags, formats=TOURNAMENT_FORMATS, seeding_modes=SEEDING_MODES
+    )
+
+@bp.route('/admin/users')
+@admin_required
+def admin_users():
+    """Страница таблицы участников для админ-панели (HTML-фрагмент): q, tag, cursor как в /api/users"""
+    prefix, tag = request.args.get('q', '').strip(), request.args.get('tag')
+    users, users_cursor = keyset_page(
+        search_users(db.session.query(*user_columns(USER_LIST_FIELDS)), prefix, tag),
+        (User.name, User.id),
+        request.args.get('cursor'),
+        descending=False
+    )
+    participations = group_counts(TournamentParticipant.user_id, [user.id for user in users])
+    response = make_response(render_template('_user_rows.html', users=users, participations=participations))
+    if users_cursor:
+        response.headers['X-Next-Cursor'] = users_cursor
+    return response
+
+# Размер пачки для массового импорта: укладывается в лимит параметров SQLite
+IMPORT_BATCH_SIZE = 500
+
+def import_users(rows, default_tag=None):
+    """Массово добавляет участников из итератора пар (имя, метка).
+    
+    Строки обрабатываются пачками: дубликаты внутри пачки отсекаются в памяти,
+    уже существующие имена - одним запросом на пачку, новые записи вставляются
+    одним INSERT. Пачки предыдущих шагов уже вставлены, поэтому повторы между
+    пачками тоже находятся. Возвращает (добавлено, пропущено). Коммит - за вызывающим.
+    """
+    added_count = 0
+    duplicate_count = 0
+    
+    def flush_batch(batch):
+        nonlocal added_count, duplicate_count
+        existing = {
+            name for (name,) in db.session.query(User.name).filter(User.name.in_(list(batch)))
+        }
+        new_rows = [
+            {'name': name, 'tag': tag, 'created_at': datetime.utcnow()}
+            for name, tag in batch.items() if name not in existing
+        ]
+        if new_rows:
+            db.session.execute(User.__table__.insert(), new_rows)
+        added_count += len(new_rows)
+        duplicate_count += len(batch) - len(new_rows)
+    
+    batch = {}
+    for name, tag in rows:
+        name = name.strip()[:100]
+        if not name:
+            continue
+        tag = (tag or '').strip()[:50] or default_tag
+        if name in batch:
+            duplicate_count += 1
+            continue
+        batch[name] = tag
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush_batch(batch)
+            batch = {}
+    if batch:
+        flush_batch(batch)
+    
+    return added_count, duplicate_count
+
+def read_users_file(file_storage):
+    """Построчно читает загруженный CSV/TSV со столбцами имени и метки.
+    
+    Файл не загружается в память целиком. Разделитель определяется по первой
+    строке (табуляция, точка с запятой или запятая). Строка заголовка
+    (name/tag или имя/метка) задает порядок столбцов, без нее имя - первый столбец.
+    """
+    # Поток перематывается и не закрывается: при повторе транзакции файл читается заново
+    file_storage.stream.seek(0)
+    stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    try:
+        yield from _read_users_rows(stream)
+    finally:
+        stream.detach()
+
+def _read_users_rows(stream):
+    first_line = stream.readline()
+    if not first_line:
+        return
+    delimiter = '\t' if '\t' in first_line else ';' if ';' in first_line else ','
+    
+    first_row = next(csv.reader([first_line], delimiter=delimiter))
+    header = [cell.strip().lower() for cell in first_row]
+    rows = csv.reader(stream, delimiter=delimiter)
+    
+    name_col, tag_col = 0, 1
+    if 'name' in header or 'имя' in header:
+        name_col = header.index('name') if 'name' in header else header.index('имя')
+        tag_col = header.index('tag') if 'tag' in header else header.index('метка') if 'метка' in header else None
+    else:
+        rows = itertools.chain([first_row], rows)
+    
+    for row in rows:
+        if len(row) <= name_col:
+            continue
+        tag = row[tag_col] if tag_col is not None and tag_col < len(row) else None
+        yield row[name_col], tag
 
-@app.route('/add_user', methods=['POST'])
+@bp.route('/add_user', methods=['POST'])
 @admin_required
+@write_transaction
 def add_user():
-    names_input = request.form.get('name')
+    names_input = request.form.get('name', '')
     tag = request.form.get('tag', '').strip()  # Получаем метку
+    users_file = request.files.get('users_file')
     
-    if names_input:
-        # Разделяем по запятой и очищаем от пробелов
-        names = [name.strip() for name in names_input.split(',') if name.strip()]
-        
-        if not names:
-            flash('Имя пользователя не может быть пустым!', 'error')
-            return redirect(url_for('admin'))
-        
-        added_count = 0
-        duplicate_count = 0
-        
-        for name in names:
-            # Проверяем, существует ли уже пользователь с таким именем
-            existing_user = User.query.filter_by(name=name).first()
-            if existing_user:
-                duplicate_count += 1
-                continue
-            
-            user = User(name=name, tag=tag if tag else None)
-            db.session.add(user)
-            added_count += 1
-        
-        try:
-            db.session.commit()
-            
-            # Формируем сообщение в зависимости от результата
-            if added_count > 0 and duplicate_count > 0:
-                flash(f'Добавлено участников: {added_count}. Пропущено дубликатов: {duplicate_count}', 'warning')
-            elif added_count > 0:
-                if added_count == 1:
-                    flash('Участник добавлен успешно!', 'success')
-                else:
-                    flash(f'Добавлено участников: {added_count}', 'success')
-            elif duplicate_count > 0:
-                flash('Все указанные участники уже существуют в системе!', 'error')
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Ошибка при добавлении участников: {str(e)}', 'error')
+    if users_file and users_file.filename:
+        # Импорт из CSV/TSV файла
+        rows = read_users_file(users_file)
+    else:
+        # Разделяем по запятой, пустые имена отбрасываются при импорте
+        rows = ((name, None) for name in names_input.split(','))
+    
+    try:
+        added_count, duplicate_count = import_users(rows, tag if tag else None)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if is_contention_error(e):
+            raise
+        flash(f'Ошибка при добавлении участников: {str(e)}', 'error')
+        return redirect(url_for('main.admin'))
+    
+    # Формируем сообщение в зависимости от результата
+    if added_count > 0 and duplicate_count > 0:
+        flash(f'Добавлено участников: {added_count}. Пропущено дубликатов: {duplicate_count}', 'warning')
+    elif added_count > 0:
+        if added_count == 1:
+            flash('Участник добавлен успешно!', 'success')
+        else:
+            flash(f'Добавлено участников: {added_count}', 'success')
+    elif duplicate_count > 0:
+        flash('Все указанные участники уже существуют в системе!', 'error')
     else:
         flash('Имя пользователя не может быть пустым!', 'error')
-    return redirect(url_for('admin'))
+    return redirect(url_for('main.admin'))
+
+def user_links():
+    """Пары (user_id, tournament_id): участие, игрок или победитель матча, победитель турнира"""
+    return union_all(
+        db.select(TournamentParticipant.user_id, TournamentParticipant.tournament_id),
+        *[db.select(player.label('user_id'), Match.tournament_id)
+          for player in (Match.player1_id, Match.player2_id, Match.winner_id)],
+        db.select(Tournament.winner_id.label('user_id'), Tournament.id.label('tournament_id')),
+    ).subquery()
+
+def user_dependencies(user_ids):
+    """Турниры, с которыми связаны участники, одним запросом: {user_id: [названия турниров]}.
+    
+    user_ids - список или подзапрос SELECT id: выборка по метке не разворачивается
+    в список параметров и не упирается в их лимит.
+    """
+    links = user_links()
+    rows = db.session.execute(
+        db.select(links.c.user_id, Tournament.name)
+        .join(Tournament, Tournament.id == links.c.tournament_id)
+        .where(links.c.user_id.in_(user_ids))
+        .group_by(links.c.user_id, Tournament.id, Tournament.name)
+        .order_by(links.c.user_id, Tournament.id)
+    )
+    dependencies = {}
+    for user_id, name in rows:
+        dependencies.setdefault(user_id, []).append(name)
+    return dependencies
+
+def id_batches(ids):
+    """Список id пачками по IMPORT_BATCH_SIZE.
+    
+    UPDATE и DELETE таблицы user получают id списком, а не подзапросом к той же
+    таблице: MySQL такие запросы отклоняет (ошибка 1093).
+    """
+    ids = sorted(ids)
+    for start in range(0, len(ids), IMPORT_BATCH_SIZE):
+        yield ids[start:start + IMPORT_BATCH_SIZE]
+
+def delete_users(user_ids):
+    """Удаляет участников без связей с турнирами. Возвращает (удалено, {user_id: турниры})"""
+    blocked = user_dependencies(user_ids)
+    links = user_links()
+    free = db.select(User.id).where(
+        User.id.in_(user_ids),
+        User.id.notin_(db.select(links.c.user_id).where(links.c.user_id.isnot(None)))
+    )
+    deleted = 0
+    for batch in id_batches(db.session.scalars(free)):
+        UserStats.query.filter(UserStats.user_id.in_(batch)).delete(synchronize_session=False)
+        deleted += User.query.filter(User.id.in_(batch)).delete(synchronize_session=False)
+    return deleted, blocked
+
+def force_delete_users(user_ids):
+    """Удаляет участников вместе с участиями и матчами несколькими запросами по множеству.
+    
+    user_ids - список или подзапрос SELECT id. Соперники теряют матчи, сыгранные
+    с удаляемыми, победы в турнирах снимаются. Матчи сеток олимпийской системы
+    не удаляются (на них ссылаются next_match_id других матчей) - из них
+    убирается игрок, см. vacate_bracket_slots; турниры с таблицей продолжаются,
+    см. resume_standings_tournaments. Возвращает (удалено, id турниров, сетки
+    которых изменились - их версии уже увеличены, кэш сбрасывается после
+    коммита). Коммит - за вызывающим.
+    """
+    selected = set(db.session.scalars(db.select(User.id).where(User.id.in_(user_ids))))
+    involved = or_(
+        Match.player1_id.in_(user_ids),
+        Match.player2_id.in_(user_ids),
+        Match.winner_id.in_(user_ids)
+    )
+    
+    # Турниры, сетки которых изменятся
+    tournament_ids = {
+        tournament_id for (tournament_id,) in db.session.query(TournamentParticipant.tournament_id)
+        .filter(TournamentParticipant.user_id.in_(user_ids))
+        .union(db.session.query(Match.tournament_id).filter(involved))
+    }
+    
+    deltas = user_stats_deltas(involved)
+    apply_user_stats({user_id: values for user_id, values in deltas.items() if user_id not in selected}, sign=-1)
+    UserStats.query.filter(UserStats.user_id.in_(user_ids)).delete(synchronize_session=False)
+    Tournament.query.filter(Tournament.winner_id.in_(user_ids)).update(
+        {'winner_id': None}, synchronize_session=False
+    )
+    TournamentParticipant.query.filter(TournamentParticipant.user_id.in_(user_ids)).delete(synchronize_session=False)
+    # Слоты есть только у сеток олимпийской системы: позиции матчей швейцарской и
+    # круговой систем - лишь порядок вывода в туре
+    slotted = and_(Match.position.isnot(None), Match.tournament_id.in_(
+        db.select(Tournament.id).where(Tournament.format == 'single_elimination')
+    ))
+    vacate_bracket_slots(
+        Match.query.filter(involved, slotted)
+        .order_by(Match.tournament_id, Match.round_number, Match.position),
+        selected
+    )
+    Match.query.filter(involved, ~slotted).delete(synchronize_session=False)
+    resume_standings_tournaments(tournament_ids)
+    # Пользователи - последними: подзапрос по метке выбирает их до этого момента
+    for batch in id_batches(selected):
+        User.query.filter(User.id.in_(batch)).delete(synchronize_session=False)
+    bump_bracket_version(*tournament_ids)
+    return len(selected), tournament_ids
 
-@app.route('/delete_user/<int:user_id>', methods=['POST'])
+def resume_standings_tournaments(tournament_ids):
+    """Продвигает идущие турниры с таблицей, у которых удаленные матчи были последними несыгранными.
+    
+    Тур (или весь круговой турнир) мог ждать только матчей удаленных участников:
+    результата, который продвинул бы турнир, больше не будет, поэтому продвижение
+    запускается здесь. Формат сам проверяет, что несыгранных матчей не осталось.
+    """
+    tournaments = Tournament.query.filter(
+        Tournament.id.in_(tournament_ids), Tournament.status == 'active',
+        Tournament.format.in_([key for key, value in TOURNAMENT_FORMATS.items() if value.uses_standings])
+    )
+    for tournament in tournaments:
+        tournament_format = tournament_format_of(tournament)
+        last = (
+            Match.query.filter_by(tournament_id=tournament.id)
+            .order_by(Match.round_number.desc(), Match.id.desc()).first()
+        )
+        if last is None:
+            tournament_format.finish(tournament)
+            completed = True
+        else:
+            completed, _ = tournament_format.advance(last)
+        if completed and tournament.winner_id is not None:
+            apply_user_stats({tournament.winner_id: (0, 0, 1)})
+
+def vacate_bracket_slots(matches, removed):
+    """Убирает удаляемых участников removed из матчей сеток со слотами (в порядке раундов).
+    
+    Сыгранный матч теряет игрока, а если тот победил - и победителя; его слот в
+    следующем матче освобождается дальше по порядку. В несыгранном матче соперник
+    проходит дальше без игры, а если соперника еще нет - матч становится матчем с
+    bye. Матч, в который уже никто не придет, завершается без победителя, и
+    закрывается его слот в следующем матче. Матчи без второго игрока в
+    статистике не считаются, поэтому она совпадает с пересчетом с нуля.
+    """
+    for match in matches:
+        closed = 0
+        if match.player1_id in removed:
+            match.player1_id = None
+            closed += 1
+        if match.player2_id in removed:
+            match.player2_id = None
+            closed += 1
+        if match.winner_id in removed:
+            match.winner_id = None
+        if not match.is_completed and closed:
+            close_bracket_slots(match, closed)
+
+def close_bracket_slots(match, closed):
+    """Закрывает closed слотов несыгранного матча: в них уже никто не придет"""
+    while True:
+        if match.is_bye:
+            closed += 1
+        player_id = match.player1_id if match.player1_id is not None else match.player2_id
+        match.is_bye = True
+        if closed < 2:
+            if player_id is not None:
+                # Оставшийся игрок проходит дальше без игры
+                match.winner_id = player_id
+                match.is_completed = True
+                advance_winner(match)
+            return
+        
+        match.is_completed = True
+        if match.next_match_id is None:
+            match.tournament.status = 'completed'
+            return
+        match, closed = match.next_match, 1
+        if match is None:
+            raise BracketError('Следующий матч не найден: сетка турнира повреждена')
+
+@bp.route('/delete_user/<int:user_id>', methods=['POST'])
 @admin_required
+@write_transaction
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     
-    # Проверяем, участвует ли пользователь в активных турнирах
-    active_participations = TournamentParticipant.query.filter_by(user_id=user_id).all()
-    
-    if active_participations:
-        # Получаем названия турниров, в которых участвует пользователь
-        tournament_names = []
-        for participation in active_participations:
-            tournament_names.append(participation.tournament.name)
-        
+    # Проверяем связи пользователя с турнирами (участие, матчи, победа) одним запросом
+    tournament_names = user_dependencies([user_id]).get(user_id)
+    if tournament_names:
         flash(f'Нельзя удалить пользователя {user.name}, так как он участвует в турнирах: {", ".join(tournament_names)}', 'error')
-        return redirect(url_for('admin'))
-    
-    # Проверяем, есть ли матчи с участием этого пользователя
-    matches_as_player1 = Match.query.filter_by(player1_id=user_id).count()
-    matches_as_player2 = Match.query.filter_by(player2_id=user_id).count()
-    matches_as_winner = Match.query.filter_by(winner_id=user_id).count()
-    
-    if matches_as_player1 > 0 or matches_as_player2 > 0 or matches_as_winner > 0:
-        flash(f'Нельзя удалить пользователя {user.name}, так как он участвовал в матчах турниров', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('main.admin'))
     
     try:
-        # Если все проверки пройдены, удаляем пользователя
-        db.session.delete(user)
+        # Если все проверки пройдены, удаляем пользователя (и его пустую статистику)
+        user_name = user.name
+        delete_users([user_id])
         db.session.commit()
-        flash(f'Пользователь {user.name} успешно удален!', 'success')
+        flash(f'Пользователь {user_name} успешно удален!', 'success')
     except Exception as e:
         db.session.rollback()
+        if is_contention_error(e):
+            raise
         flash(f'Ошибка при удалении пользователя: {str(e)}', 'error')
     
-    return redirect(url_for('admin'))
+    return redirect(url_for('main.admin'))
 
-@app.route('/force_delete_user/<int:user_id>', methods=['POST'])
+@bp.route('/force_delete_user/<int:user_id>', methods=['POST'])
 @admin_required
+@write_transaction
 def force_delete_user(user_id):
     """Принудительное удаление пользователя со всеми связанными записями"""
     user = User.query.get_or_404(user_id)
@@ -184,39 +1174,98 @@ def force_delete_user(user_id):
     
     if confirm != 'DELETE_USER':
         flash('Неправильное подтверждение. Введите "DELETE_USER"', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('main.admin'))
     
     try:
-        # Удаляем все участия в турнирах
-        TournamentParticipant.query.filter_by(user_id=user_id).delete()
-        
-        # Удаляем все матчи, где пользователь был игроком или победителем
-        Match.query.filter(
-            or_(
-                Match.player1_id == user_id,
-                Match.player2_id == user_id,
-                Match.winner_id == user_id
-            )
-        ).delete()
-        
-        # Удаляем самого пользователя
-        db.session.delete(user)
+        user_name = user.name
+        _, tournament_ids = force_delete_users([user_id])
         db.session.commit()
+        bracket_cache.invalidate(*tournament_ids)
         
-        flash(f'Пользователь {user.name} и все связанные данные принудительно удалены!', 'warning')
+        flash(f'Пользователь {user_name} и все связанные данные принудительно удалены!', 'warning')
     except Exception as e:
         db.session.rollback()
+        if is_contention_error(e):
+            raise
         flash(f'Ошибка при принудительном удалении: {str(e)}', 'error')
     
-    return redirect(url_for('admin'))
+    return redirect(url_for('main.admin'))
+
+# Массовые операции над участниками: выбранные id или все участники с меткой
+BULK_USER_ACTIONS = ('delete', 'force_delete', 'retag')
+
+@bp.route('/admin/users/bulk', methods=['POST'])
+@admin_required
+@write_transaction
+def bulk_users():
+    """Удаление, принудительное удаление или смена метки для набора участников одной транзакцией"""
+    action = request.form.get('action')
+    if action not in BULK_USER_ACTIONS:
+        flash('Неизвестное действие!', 'error')
+        return redirect(url_for('main.admin'))
+    
+    if request.form.get('scope') == 'tag':
+        tag = request.form.get('tag', '').strip()
+        user_ids = db.select(User.id).where(User.tag == tag if tag else or_(User.tag.is_(None), User.tag == ''))
+    else:
+        try:
+            user_ids = sorted({int(user_id) for user_id in request.form.getlist('user_ids')})
+        except ValueError:
+            flash('Некорректный список участников!', 'error')
+            return redirect(url_for('main.admin'))
+    selected_count = db.session.query(func.count(User.id)).filter(User.id.in_(user_ids)).scalar()
+    if not selected_count:
+        flash('Не выбрано ни одного участника!', 'error')
+        return redirect(url_for('main.admin'))
+    
+    if action == 'force_delete' and request.form.get('confirm') != 'DELETE_USER':
+        flash('Неправильное подтверждение. Введите "DELETE_USER"', 'error')
+        return redirect(url_for('main.admin'))
+    
+    try:
+        if action == 'retag':
+            new_tag = request.form.get('new_tag', '').strip()[:50] or None
+            for batch in id_batches(db.session.scalars(db.select(User.id).where(User.id.in_(user_ids)))):
+                User.query.filter(User.id.in_(batch)).update({'tag': new_tag}, synchronize_session=False)
+            db.session.commit()
+            flash(f'Метка изменена у участников: {selected_count}', 'success')
+        elif action == 'delete':
+            deleted, blocked = delete_users(user_ids)
+            db.session.commit()
+            if blocked:
+                flash(f'Удалено участников: {deleted}. Пропущено связанных с турнирами: {len(blocked)} '
+                      f'(принудительное удаление уберет и их матчи)', 'warning')
+            else:
+                flash(f'Удалено участников: {deleted}', 'success')
+        else:
+            deleted, tournament_ids = force_delete_users(user_ids)
+            db.session.commit()
+            bracket_cache.invalidate(*tournament_ids)
+            flash(f'Принудительно удалено участников: {deleted}, затронуто турниров: {len(tournament_ids)}', 'warning')
+    except Exception as e:
+        db.session.rollback()
+        if is_contention_error(e):
+            raise
+        flash(f'Ошибка массовой операции: {str(e)}', 'error')
+    
+    return redirect(url_for('main.admin'))
 
-@app.route('/delete_tournament/<int:tournament_id>', methods=['POST'])
+@bp.route('/delete_tournament/<int:tournament_id>', methods=['POST'])
 @admin_required
+@write_transaction
 def delete_tournament(tournament_id):
     """Удаление турнира со всеми связанными данными"""
     tournament = Tournament.query.get_or_404(tournament_id)
     
     try:
+        # Вычитаем результаты турнира из статистики участников
+        apply_user_stats(merge_stats_deltas(
+            user_stats_deltas(Match.tournament_id == tournament_id),
+            standings_title_deltas(Tournament.id == tournament_id),
+            archive_stats_deltas(TournamentArchive.tournament_id == tournament_id)
+        ), sign=-1)
+        TournamentArchive.query.filter_by(tournament_id=tournament_id).delete()
+        
         # Удаляем все матчи турнира
         Match.query.filter_by(tournament_id=tournament_id).delete()
         
@@ -226,157 +1275,1271 @@ def delete_tournament(tournament_id):
         # Удаляем сам турнир
         db.session.delete(tournament)
         db.session.commit()
+        bracket_cache.invalidate(tournament_id)
         
         flash(f'Турнир "{tournament.name}" и все связанные данные успешно удалены!', 'success')
     except Exception as e:
         db.session.rollback()
+        if is_contention_error(e):
+            raise
         flash(f'Ошибка при удалении турнира: {str(e)}', 'error')
     
-    return redirect(url_for('admin'))
+    return redirect(url_for('main.admin'))
 
-@app.route('/create_tournament', methods=['POST'])
+@bp.route('/create_tournament', methods=['POST'])
 @admin_required
+@write_transaction
 def create_tournament():
     tournament_name = request.form.get('tournament_name', 'Турнир')
     selected_users = request.form.getlist('selected_users')
+    format_key = request.form.get('format', 'single_elimination')
+    
+    if format_key not in TOURNAMENT_FORMATS:
+        flash('Неизвестный формат турнира!', 'error')
+        return redirect(url_for('main.admin'))
+    tournament_format = TOURNAMENT_FORMATS[format_key]
     
-    if len(selected_users) < 2:
+    try:
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in selected_users))
+    except ValueError:
+        flash('Некорректный список участников!', 'error')
+        return redirect(url_for('main.admin'))
+    
+    if len(user_ids) < 2:
         flash('Для турнира нужно минимум 2 участника!', 'error')
-        return redirect(url_for('admin'))
+        return redirect(url_for('main.admin'))
+    
+    error = tournament_format.validate(len(user_ids))
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('main.admin'))
+    
+    # Проверяем всех выбранных участников одним запросом
+    names = dict(db.session.query(User.id, User.name).filter(User.id.in_(user_ids)))
+    if len(names) != len(user_ids):
+        flash(f'Участники не найдены: {len(user_ids) - len(names)}. Обновите страницу и попробуйте снова.', 'error')
+        return redirect(url_for('main.admin'))
+    
+    # Ручной посев: имена или id выбранных участников через запятую или с новой строки
+    seeding = request.form.get('seeding', 'random')
+    if seeding not in SEEDING_MODES:
+        flash('Неизвестный способ посева!', 'error')
+        return redirect(url_for('main.admin'))
+    manual_order = []
+    if seeding == 'manual':
+        by_name = {name: user_id for user_id, name in names.items()}
+        unknown = []
+        for entry in request.form.get('seed_order', '').replace('\n', ',').split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            user_id = int(entry) if entry.isdigit() and int(entry) in names else by_name.get(entry)
+            if user_id is None:
+                unknown.append(entry)
+            elif user_id not in manual_order:
+                manual_order.append(user_id)
+        if unknown:
+            flash(f'В порядке посева указаны не выбранные участники: {", ".join(unknown[:10])}', 'error')
+            return redirect(url_for('main.admin'))
+    user_ids = seed_participants(user_ids, seeding, manual_order)
     
     # Создаем турнир
-    tournament = Tournament(name=tournament_name)
+    tournament = Tournament(
+        name=tournament_name,
+        format=format_key,
+        rounds_total=tournament_format.rounds_for(len(user_ids), request.form.get('rounds', type=int)),
+    )
     db.session.add(tournament)
     db.session.flush()  # Получаем ID турнира
     
-    # Добавляем участников
-    for user_id in selected_users:
-        participant = TournamentParticipant(tournament_id=tournament.id, user_id=int(user_id))
-        db.session.add(participant)
+    # Добавляем участников одним INSERT
+    db.session.execute(
+        TournamentParticipant.__table__.insert(),
+        [{'tournament_id': tournament.id, 'user_id': user_id} for user_id in user_ids]
+    )
     
-    # Создаем турнирную сетку
-    create_tournament_bracket(tournament.id, selected_users)
+    # Создаем турнирную сетку или первые туры
+    tournament_format.create(tournament, user_ids)
     
     db.session.commit()
     flash('Турнир создан успешно!', 'success')
-    return redirect(url_for('admin'))
+    return redirect(url_for('main.admin'))
+
+# Способы посева: первый в списке посева - сильнейший участник
+SEEDING_MODES = {
+    'random': 'Случайный',
+    'manual': 'Вручную',
+    'win_rate': 'По проценту побед',
+}
+
+def seed_participants(user_ids, mode, manual_order=()):
+    """Упорядочивает участников по посеву.
+    
+    manual - сначала участники из manual_order в указанном порядке, остальные
+    за ними в случайном; win_rate - по доле побед из статистики участников со
+    сглаживанием (побед + 1) / (матчей + 2), чтобы одна случайная победа не
+    ставила новичка выше опытного игрока; random - случайный порядок.
+    """
+    ordered = list(user_ids)
+    random.shuffle(ordered)
+    if mode == 'manual':
+        rank = {user_id: index for index, user_id in enumerate(manual_order)}
+        ordered.sort(key=lambda user_id: rank.get(user_id, len(rank)))
+    elif mode == 'win_rate':
+        stats = {
+            user_id: (wins + 1) / (played + 2)
+            for user_id, played, wins in db.session.query(
+                UserStats.user_id, UserStats.matches_played, UserStats.wins
+            ).filter(UserStats.user_id.in_(ordered))
+        }
+        ordered.sort(key=lambda user_id: -stats.get(user_id, 0.5))
+    return ordered
+
+def seed_positions(size):
+    """Номера посева по слотам первого раунда сетки на size (степень двойки) мест.
+    
+    Для 8 мест: 1, 8, 4, 5, 2, 7, 3, 6 - сумма номеров в паре равна size + 1,
+    а первый и второй номера могут встретиться только в финале.
+    """
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for first in order for seed in (first, total - first)]
+    return order
+
+def build_bracket_layout(participants):
+    """Рассчитывает всю сетку за один проход: список раундов, каждый - список словарей-матчей.
+    
+    participants - в порядке посева. Сетка дополняется до степени двойки,
+    недостающие места - bye, которые по расстановке seed_positions достаются
+    сильнейшим номерам и только в первом раунде: их игроки сразу стоят во втором
+    раунде, дальше все матчи полные. Победитель матча из слота p уходит в слот
+    p % 2 + 1 матча p // 2 следующего раунда.
+    """
+    size = 1 << max(1, (len(participants) - 1).bit_length())
+    slots = [
+        participants[seed - 1] if seed <= len(participants) else None
+        for seed in seed_positions(size)
+    ]
+    
+    rounds = []
+    matches_in_round = size // 2
+    while matches_in_round:
+        rounds.append([
+            {
+                'round_number': len(rounds) + 1,
+                'position': position,
+                'player1_id': slots[2 * position] if not rounds else None,
+                'player2_id': slots[2 * position + 1] if not rounds else None,
+                'winner_id': None,
+                'is_completed': False,
+                'is_bye': False,
+                'next_slot': position % 2 + 1 if matches_in_round > 1 else None,
+            }
+            for position in range(matches_in_round)
+        ])
+        matches_in_round //= 2
+    
+    # Игроки с bye сразу стоят в своем слоте второго раунда
+    for match in rounds[0]:
+        if match['player2_id'] is None:
+            match.update(is_bye=True, is_completed=True, winner_id=match['player1_id'])
+            next_match = rounds[1][match['position'] // 2]
+            next_match['player1_id' if match['next_slot'] == 1 else 'player2_id'] = match['player1_id']
+    
+    return rounds
 
 def create_tournament_bracket(tournament_id, user_ids):
-    """Создает турнирную сетку"""
+    """Создает турнирную сетку целиком: все раунды с номерами слотов и ссылками на следующий матч.
+    
+    user_ids - в порядке посева. Раунды вставляются от финала к первому: так id
+    следующего матча уже известен. Каждый раунд пишется одним executemany без
+    ORM-объектов, id его матчей затем читаются одним запросом по индексу
+    (tournament_id, round_number).
+    """
     participants = [int(uid) for uid in user_ids]
     
-    # Перемешиваем участников
-    random.shuffle(participants)
+    next_round_ids = []
+    for round_matches in reversed(build_bracket_layout(participants)):
+        for match in round_matches:
+            match['tournament_id'] = tournament_id
+            match['next_match_id'] = next_round_ids[match['position'] // 2] if next_round_ids else None
+        db.session.execute(Match.__table__.insert(), round_matches)
+        next_round_ids = db.session.execute(
+            db.select(Match.id)
+            .filter_by(tournament_id=tournament_id, round_number=round_matches[0]['round_number'])
+            .order_by(Match.position)
+        ).scalars().all()
+
+class BracketError(Exception):
+    """Сетка турнира повреждена: ссылка на следующий матч ведет на несуществующий матч"""
+
+def advance_winner(match):
+    """Переносит победителя завершенного матча в его слот следующего матча.
+    
+    Работает за O(1): трогает только следующий матч (и цепочку bye-матчей за ним),
+    без пересчета раунда. Возвращает пару (турнир завершен, список измененных
+    следующих матчей). Финал - матч без ссылки на следующий; если ссылка есть, а
+    матча нет, выбрасывается BracketError.
+    """
+    changed = []
+    while True:
+        if match.next_match_id is None:
+            match.tournament.status = 'completed'
+            return True, changed
+        next_match = match.next_match
+        if next_match is None:
+            raise BracketError(f'Следующий матч {match.next_match_id} не найден: сетка турнира повреждена')
+        
+        if match.next_slot == 1:
+            next_match.player1_id = match.winner_id
+        else:
+            next_match.player2_id = match.winner_id
+        changed.append(next_match)
+        
+        if not next_match.is_bye:
+            return False, changed
+        
+        # Соперника в следующем матче не будет - игрок проходит дальше автоматически
+        next_match.winner_id = match.winner_id
+        next_match.is_completed = True
+        match = next_match
+
+# Форматы турниров. Формат создает матчи при создании турнира и решает, что
+# происходит после каждого результата: олимпийская система двигает победителя по
+# сетке, швейцарская после завершения тура составляет пары следующего, в круговой
+# все туры расписаны заранее. Туры всех форматов хранятся в Match.round_number.
+SWISS_REPAIR_PLAYERS = 64
+SWISS_REPAIR_STEPS = 20000
+
+def compute_standings(matches):
+    """Турнирная таблица по матчам: {user_id: {'score', 'played', 'opponents', 'buchholz', 'sonneborn_berger'}}.
+    
+    Очко дается за каждую победу, в том числе за bye. opponents - все соперники,
+    включая еще не сыгранные матчи (для запрета повторных встреч). Бухгольц - сумма
+    очков сыгранных соперников, коэффициент Бергера - сумма очков побежденных.
+    """
+    table = {}
     
-    # Вычисляем количество раундов
-    num_rounds = math.ceil(math.log2(len(participants)))
+    def entry(user_id):
+        if user_id not in table:
+            table[user_id] = {'score': 0, 'played': 0, 'opponents': set(), 'faced': [], 'beaten': []}
+        return table[user_id]
     
-    # Создаем матчи для первого раунда
-    current_round = participants.copy()
-    round_num = 1
+    for match in matches:
+        first, second = match.player1_id, match.player2_id
+        for player in (first, second):
+            if player is not None:
+                entry(player)
+        if first is not None and second is not None:
+            table[first]['opponents'].add(second)
+            table[second]['opponents'].add(first)
+            if match.is_completed:
+                for player, opponent in ((first, second), (second, first)):
+                    table[player]['played'] += 1
+                    table[player]['faced'].append(opponent)
+                    if match.winner_id == player:
+                        table[player]['beaten'].append(opponent)
+        if match.is_completed and match.winner_id is not None:
+            entry(match.winner_id)['score'] += 1
     
-    while len(current_round) > 1:
-        next_round = []
-        
-        # Создаем матчи для текущего раунда
-        for i in range(0, len(current_round), 2):
-            player1_id = current_round[i]
-            player2_id = current_round[i + 1] if i + 1 < len(current_round) else None
-            
-            match = Match(
-                tournament_id=tournament_id,
-                round_number=round_num,
-                player1_id=player1_id,
-                player2_id=player2_id
-            )
-            db.session.add(match)
-            
-            # Если только один игрок (нечетное количество), он автоматически проходит
-            if player2_id is None:
-                match.winner_id = player1_id
-                match.is_completed = True
-                next_round.append(player1_id)
+    for row in table.values():
+        row['buchholz'] = sum(table[opponent]['score'] for opponent in row.pop('faced'))
+        row['sonneborn_berger'] = sum(table[opponent]['score'] for opponent in row.pop('beaten'))
+    return table
+
+def pair_swiss_round(ranking, table, byes):
+    """Пары тура швейцарской системы за линейное в типичном случае время.
+    
+    ranking - участники по убыванию места, table - результат compute_standings,
+    byes - кто уже получал bye. Возвращает (список пар, участник с bye или None).
+    
+    При нечетном числе bye получает самый низкий в таблице участник без bye.
+    Группы с равными очками делятся пополам, верхняя половина играет с нижней
+    (голландская система); кто не нашел соперника без повторной встречи,
+    опускается в следующую группу. Если в конце остались участники без пары,
+    последние пары пересобираются перебором с ограниченным числом шагов.
+    """
+    players = list(ranking)
+    bye = None
+    if len(players) % 2:
+        bye = next((player for player in reversed(players) if player not in byes), players[-1])
+        players.remove(bye)
+    
+    no_history = {'score': 0, 'opponents': ()}
+    
+    def history(player):
+        return table.get(player, no_history)
+    
+    pairs, floaters = [], []
+    for _, group in itertools.groupby(players, key=lambda player: history(player)['score']):
+        pool = floaters + list(group)
+        half = len(pool) // 2
+        top, bottom = pool[:half], pool[half:]
+        used = [False] * len(bottom)
+        floaters = []
+        start = 0
+        for player in top:
+            while start < len(bottom) and used[start]:
+                start += 1
+            opponents = history(player)['opponents']
+            for i in range(start, len(bottom)):
+                if not used[i] and bottom[i] not in opponents:
+                    used[i] = True
+                    pairs.append((player, bottom[i]))
+                    break
             else:
-                # Добавляем placeholder для следующего раунда
-                next_round.append(None)
+                floaters.append(player)
+        floaters.extend(candidate for candidate, taken in zip(bottom, used) if not taken)
+    
+    if floaters:
+        rank = {player: index for index, player in enumerate(players)}
+        pairs = _repair_swiss_pairs(pairs, floaters, history, rank)
+    return pairs, bye
+
+def _repair_swiss_pairs(pairs, unpaired, history, rank):
+    """Разбивает оставшихся, по очереди добавляя к ним последние пары тура"""
+    taken = 1
+    while True:
+        taken = min(taken, len(pairs))
+        pool = sorted([player for pair in pairs[len(pairs) - taken:] for player in pair] + unpaired, key=rank.get)
+        if len(pool) > SWISS_REPAIR_PLAYERS:
+            break
+        result = _pair_without_rematches(pool, history)
+        if result is not None:
+            return pairs[:len(pairs) - taken] + result
+        if taken == len(pairs):
+            break
+        taken *= 2
+    
+    # Без повторной встречи не разбить: оставшиеся играют по порядку мест
+    unpaired = sorted(unpaired, key=rank.get)
+    return pairs + list(zip(unpaired[::2], unpaired[1::2]))
+
+def _pair_without_rematches(pool, history):
+    """Перебор с возвратом: пары для всех из pool без повторных встреч или None"""
+    steps = [0]
+    
+    def search(remaining):
+        if not remaining:
+            return []
+        first, rest = remaining[0], remaining[1:]
+        opponents = history(first)['opponents']
+        for i, candidate in enumerate(rest):
+            steps[0] += 1
+            if steps[0] > SWISS_REPAIR_STEPS:
+                return None
+            if candidate in opponents:
+                continue
+            tail = search(rest[:i] + rest[i + 1:])
+            if tail is not None:
+                return [(first, candidate)] + tail
+        return None
+    
+    return search(pool)
+
+def circle_schedule(players):
+    """Расписание круговой системы методом вращения.
+    
+    players - четное число участников, None - пустое место (в этом туре
+    соперник отдыхает). Первый участник стоит на месте, остальные сдвигаются
+    по кругу; за len(players) - 1 туров каждый встречается с каждым один раз.
+    """
+    count = len(players)
+    rotation = list(players)
+    for round_index in range(count - 1):
+        pairs = []
+        for i in range(count // 2):
+            first, second = rotation[i], rotation[count - 1 - i]
+            if i == 0 and round_index % 2:
+                first, second = second, first
+            if first is not None and second is not None:
+                pairs.append((first, second))
+        yield pairs
+        rotation = [rotation[0], rotation[-1]] + rotation[1:-1]
+
+def round_rows(tournament_id, round_number, pairs, bye=None):
+    """Строки матчей тура для executemany: пары и, если есть, bye (засчитывается как победа)"""
+    rows = [
+        {
+            'tournament_id': tournament_id, 'round_number': round_number, 'position': position,
+            'player1_id': first, 'player2_id': second, 'winner_id': None,
+            'is_completed': False, 'is_bye': False, 'next_match_id': None, 'next_slot': None,
+        }
+        for position, (first, second) in enumerate(pairs)
+    ]
+    if bye is not None:
+        rows.append({
+            'tournament_id': tournament_id, 'round_number': round_number, 'position': len(rows),
+            'player1_id': bye, 'player2_id': None, 'winner_id': bye,
+            'is_completed': True, 'is_bye': True, 'next_match_id': None, 'next_slot': None,
+        })
+    return rows
+
+class TournamentFormat(ABC):
+    """Формат турнира: создание туров и обработка результата матча"""
+    key = None
+    title = None
+    # Итог определяется таблицей очков (иначе - финалом сетки)
+    uses_standings = False
+    # Продвижение зависит только от состояния турнира, а не от записанного матча:
+    # пакет результатов продвигается один раз в конце
+    advance_once = False
+    tiebreak = 'buchholz'
+    tiebreak_title = 'Бухгольц'
+    
+    def validate(self, participants_count):
+        """Сообщение об ошибке, если формат не подходит для такого числа участников"""
+        return None
+    
+    def rounds_for(self, participants_count, requested=None):
+        """Число туров, сохраняемое в Tournament.rounds_total (None - определяется сеткой)"""
+        return None
+    
+    @abstractmethod
+    def create(self, tournament, user_ids):
+        """Создает матчи нового турнира, user_ids - в порядке посева"""
+    
+    @abstractmethod
+    def advance(self, match):
+        """Обрабатывает записанный результат match.
         
-        current_round = next_round
-        round_num += 1
+        Возвращает пару (турнир завершен, другие измененные матчи). None вместо
+        списка означает, что изменилась структура турнира и зрителям нужно
+        перезагрузить страницу.
+        """
+    
+    def total_rounds(self, tournament, participants_count):
+        return tournament.rounds_total or 1
+    
+    def round_name(self, round_number, total_rounds):
+        return f'Тур {round_number}'
+    
+    def ranking(self, table):
+        """Участники по местам: очки, затем дополнительный показатель"""
+        return sorted(table, key=lambda player: (-table[player]['score'], -table[player][self.tiebreak], player))
+    
+    def finish(self, tournament):
+        """Завершает турнир, победитель - первое место таблицы"""
+        matches = db.session.query(
+            Match.player1_id, Match.player2_id, Match.winner_id, Match.is_completed
+        ).filter_by(tournament_id=tournament.id).all()
+        ranking = self.ranking(compute_standings(matches))
+        tournament.status = 'completed'
+        tournament.winner_id = ranking[0] if ranking else None
 
-@app.route('/tournament/<int:tournament_id>')
-def tournament_view(tournament_id):
-    tournament = Tournament.query.get_or_404(tournament_id)
-    matches = Match.query.filter_by(tournament_id=tournament_id).order_by(Match.round_number, Match.id).all()
+class SingleEliminationFormat(TournamentFormat):
+    key = 'single_elimination'
+    title = 'Олимпийская система'
+    
+    def create(self, tournament, user_ids):
+        create_tournament_bracket(tournament.id, user_ids)
+    
+    def advance(self, match):
+        if match.position is None:
+            # Сетки, созданные до появления слотов, продвигаются пересчетом раунда
+            create_next_round_match(match)
+            return match.tournament.status == 'completed', None
+        return advance_winner(match)
+    
+    def total_rounds(self, tournament, participants_count):
+        return math.ceil(math.log2(participants_count)) if participants_count > 1 else 1
+    
+    def round_name(self, round_number, total_rounds):
+        return get_round_name(round_number, total_rounds)
+
+class SwissFormat(TournamentFormat):
+    key = 'swiss'
+    title = 'Швейцарская система'
+    uses_standings = True
+    advance_once = True
+    
+    def rounds_for(self, participants_count, requested=None):
+        # Без повторных встреч туров не больше, чем соперников (плюс тур с bye при нечетном числе)
+        limit = participants_count if participants_count % 2 else participants_count - 1
+        rounds = requested or math.ceil(math.log2(participants_count))
+        return max(1, min(rounds, limit))
+    
+    def create(self, tournament, user_ids):
+        # Первый тур по посеву: верхняя половина играет с нижней
+        pairs, bye = pair_swiss_round(user_ids, {}, set())
+        db.session.execute(Match.__table__.insert(), round_rows(tournament.id, 1, pairs, bye))
     
+    def advance(self, match):
+        tournament = match.tournament
+        pending = db.session.query(Match.id).filter_by(
+            tournament_id=tournament.id, round_number=match.round_number, is_completed=False
+        ).first()
+        if pending is not None:
+            return False, []
+        if match.round_number >= (tournament.rounds_total or 1):
+            self.finish(tournament)
+            return True, []
+        
+        # Тур сыгран: таблица и история встреч по всем матчам турнира одним запросом
+        matches = db.session.query(
+            Match.player1_id, Match.player2_id, Match.winner_id, Match.is_completed, Match.is_bye
+        ).filter_by(tournament_id=tournament.id).all()
+        table = compute_standings(matches)
+        byes = {row.player1_id for row in matches if row.is_bye}
+        players = [
+            user_id for (user_id,) in
+            db.session.query(TournamentParticipant.user_id).filter_by(tournament_id=tournament.id)
+        ]
+        # Равных по очкам и Бухгольцу расставляем случайно
+        random.shuffle(players)
+        no_history = {'score': 0, 'buchholz': 0}
+        players.sort(key=lambda player: (
+            -table.get(player, no_history)['score'], -table.get(player, no_history)['buchholz']
+        ))
+        pairs, bye = pair_swiss_round(players, table, byes)
+        db.session.execute(Match.__table__.insert(), round_rows(tournament.id, match.round_number + 1, pairs, bye))
+        return False, None
+
+class RoundRobinFormat(TournamentFormat):
+    key = 'round_robin'
+    title = 'Круговая система'
+    uses_standings = True
+    advance_once = True
+    tiebreak = 'sonneborn_berger'
+    tiebreak_title = 'Коэффициент Бергера'
+    
+    def validate(self, participants_count):
+        limit = current_app.config['ROUND_ROBIN_MAX_PARTICIPANTS']
+        if participants_count > limit:
+            return f'В круговом турнире может быть не больше {limit} участников'
+        return None
+    
+    def rounds_for(self, participants_count, requested=None):
+        return participants_count if participants_count % 2 else participants_count - 1
+    
+    def create(self, tournament, user_ids):
+        players = list(user_ids)
+        if len(players) % 2:
+            players.append(None)
+        rows = []
+        for round_number, pairs in enumerate(circle_schedule(players), start=1):
+            rows.extend(round_rows(tournament.id, round_number, pairs))
+        db.session.execute(Match.__table__.insert(), rows)
+    
+    def advance(self, match):
+        pending = db.session.query(Match.id).filter_by(
+            tournament_id=match.tournament_id, is_completed=False
+        ).first()
+        if pending is not None:
+            return False, []
+        self.finish(match.tournament)
+        return True, []
+
+TOURNAMENT_FORMATS = {
+    tournament_format.key: tournament_format
+    for tournament_format in (SingleEliminationFormat(), SwissFormat(), RoundRobinFormat())
+}
+
+def tournament_format_of(tournament):
+    """Формат турнира (у турниров, созданных до появления форматов, - олимпийская система)"""
+    return TOURNAMENT_FORMATS.get(tournament.format) or TOURNAMENT_FORMATS['single_elimination']
+
+def load_bracket(tournament_id):
+    """Загружает турнирную сетку за фиксированное число запросов.
+
+    Все матчи приходят одним запросом вместе с игроками и победителями,
+    количество участников считается отдельным COUNT. Шаблону больше не нужно
+    обращаться к ленивым связям, поэтому число запросов не зависит от размера сетки.
+    """
+    player1 = aliased(User)
+    player2 = aliased(User)
+    winner = aliased(User)
+    matches = (
+        Match.query
+        .filter(Match.tournament_id == tournament_id)
+        .outerjoin(player1, Match.player1)
+        .outerjoin(player2, Match.player2)
+        .outerjoin(winner, Match.winner)
+        .options(
+            contains_eager(Match.player1.of_type(player1)),
+            contains_eager(Match.player2.of_type(player2)),
+            contains_eager(Match.winner.of_type(winner)),
+        )
+        .order_by(Match.round_number, Match.id)
+        .all()
+    )
+    participants_count = db.session.query(func.count(TournamentParticipant.id)).filter(
+        TournamentParticipant.tournament_id == tournament_id
+    ).scalar()
+
     # Группируем матчи по раундам
     rounds = {}
     for match in matches:
-        if match.round_number not in rounds:
-            rounds[match.round_number] = []
-        rounds[match.round_number].append(match)
+        rounds.setdefault(match.round_number, []).append(match)
+
+    # Победитель турнира - завершенный матч последнего раунда
+    final_match = None
+    if rounds:
+        last_round = max(rounds)
+        final_match = next((m for m in rounds[last_round] if m.is_completed), None)
+
+    return {
+        'rounds': rounds,
+        'participants_count': participants_count,
+        'matches_count': len(matches),
+        'completed_count': sum(1 for m in matches if m.is_completed),
+        'final_match': final_match,
+    }
+
+@bp.route('/tournament/<int:tournament_id>')
+def tournament_view(tournament_id):
+    # Версия сетки: из кэша процесса, а если она устарела - одним запросом по первичному ключу
+    ttl = current_app.config['BRACKET_CACHE_TTL']
+    state = bracket_cache.get_version(tournament_id, ttl)
+    if state is None:
+        state = db.session.query(Tournament.version, Tournament.updated_at).filter_by(id=tournament_id).first()
+        if state is None:
+            abort(404)
+        bracket_cache.set_version(tournament_id, *state)
+    version, updated_at = state
+    
+    # Страница администратора отличается кнопками и именем в меню
+    viewer = session.get('admin_username') if session.get('admin_logged_in') else None
+    etag = f'{tournament_id}-{version}'
+    if viewer:
+        etag += '-' + hashlib.sha1(viewer.encode()).hexdigest()[:8]
+    # Страницы с flash-сообщениями уникальны, их не кэшируем
+    cacheable = '_flashes' not in session
+    
+    if cacheable and not is_resource_modified(request.environ, etag=etag, last_modified=updated_at):
+        response = current_app.response_class(status=304)
+    else:
+        key = (tournament_id, version, viewer)
+        page = bracket_cache.get_page(key) if cacheable else None
+        if page is None:
+            page = render_tournament(tournament_id)
+            if cacheable:
+                bracket_cache.set_page(key, page, current_app.config['BRACKET_CACHE_SIZE'])
+        response = make_response(page)
+    
+    response.set_etag(etag)
+    if updated_at:
+        response.last_modified = updated_at
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+def render_tournament(tournament_id):
+    """Отрисовывает страницу турнирной сетки: из живых таблиц или из архивного снимка"""
+    # Турнир и его снимок (если он есть) - одним запросом по первичному ключу
+    row = (
+        db.session.query(Tournament, TournamentArchive)
+        .outerjoin(TournamentArchive, TournamentArchive.tournament_id == Tournament.id)
+        .filter(Tournament.id == tournament_id)
+        .first()
+    )
+    if row is None:
+        abort(404)
+    tournament, archive = row
+    tournament_format = tournament_format_of(tournament)
+    
+    if archive is not None:
+        bracket, round_names = snapshot_bracket(decode_snapshot(archive.data))
+        rounds = bracket['rounds']
+    else:
+        bracket = load_bracket(tournament_id)
+        rounds = bracket['rounds']
+        
+        # Определяем общее количество раундов по формату и количеству участников
+        total_rounds = tournament_format.total_rounds(tournament, bracket['participants_count'])
+        
+        # Создаем словарь названий раундов
+        round_names = {}
+        for round_num in rounds.keys():
+            round_names[round_num] = tournament_format.round_name(round_num, total_rounds)
+    
+    # Таблица для форматов с подсчетом очков; игроки уже загружены вместе с матчами
+    standings = []
+    champion = bracket['final_match'].winner if bracket['final_match'] else None
+    if tournament_format.uses_standings:
+        matches = [match for round_matches in rounds.values() for match in round_matches]
+        players = {}
+        for match in matches:
+            for player in (match.player1, match.player2):
+                if player is not None:
+                    players[player.id] = player
+        table = compute_standings(matches)
+        standings = [
+            dict(table[user_id], user=players[user_id], tiebreak=table[user_id][tournament_format.tiebreak])
+            for user_id in tournament_format.ranking(table)
+        ]
+        champion = players.get(tournament.winner_id) if tournament.status == 'completed' else None
+    
+    return render_template(
+        'tournament.html', tournament=tournament, tournament_format=tournament_format,
+        round_names=round_names, standings=standings, champion=champion, archive=archive, **bracket
+    )
+
+# Архив завершенных турниров. Снимок хранит все, что нужно для страницы турнира
+# и для восстановления строк: имена участников, матчи раундов в виде списков
+# значений ARCHIVE_MATCH_FIELDS и названия раундов.
+ARCHIVE_SNAPSHOT_VERSION = 1
+ARCHIVE_MATCH_FIELDS = (
+    'id', 'position', 'player1_id', 'player2_id', 'winner_id', 'is_completed', 'is_bye', 'next_match_id', 'next_slot',
+)
+
+def encode_snapshot(snapshot):
+    return zlib.compress(json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+def decode_snapshot(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+def build_tournament_snapshot(tournament):
+    """Снимок турнира: три запроса - матчи, участники с именами, имена прочих игроков матчей"""
+    tournament_format = tournament_format_of(tournament)
+    matches = (
+        db.session.query(Match.round_number, *[getattr(Match, field) for field in ARCHIVE_MATCH_FIELDS])
+        .filter(Match.tournament_id == tournament.id)
+        .order_by(Match.round_number, Match.position, Match.id)
+        .all()
+    )
+    participants = (
+        db.session.query(User.id, User.name)
+        .join(TournamentParticipant, TournamentParticipant.user_id == User.id)
+        .filter(TournamentParticipant.tournament_id == tournament.id)
+        .order_by(TournamentParticipant.id)
+        .all()
+    )
+    players = dict(participants)
+    missing = {
+        user_id for match in matches for user_id in (match.player1_id, match.player2_id) if user_id is not None
+    } - set(players)
+    if missing:
+        players.update(db.session.query(User.id, User.name).filter(User.id.in_(missing)))
+    
+    total_rounds = tournament_format.total_rounds(tournament, len(participants))
+    rounds = {}
+    for match in matches:
+        rounds.setdefault(match.round_number, []).append([getattr(match, field) for field in ARCHIVE_MATCH_FIELDS])
+    
+    return {
+        'snapshot_version': ARCHIVE_SNAPSHOT_VERSION,
+        'tournament': {
+            'id': tournament.id,
+            'name': tournament.name,
+            'format': tournament.format,
+            'status': tournament.status,
+            'winner_id': tournament.winner_id,
+        },
+        'participants': [user_id for user_id, _ in participants],
+        'players': {str(user_id): name for user_id, name in players.items()},
+        'rounds': [
+            {'number': number, 'name': tournament_format.round_name(number, total_rounds), 'matches': round_matches}
+            for number, round_matches in rounds.items()
+        ],
+    }
+
+def snapshot_bracket(snapshot):
+    """Сетка из снимка в том же виде, что у load_bracket, и названия раундов"""
+    players = {int(user_id): SimpleNamespace(id=int(user_id), name=name) for user_id, name in snapshot['players'].items()}
+    rounds, round_names = {}, {}
+    for round_data in snapshot['rounds']:
+        number = round_data['number']
+        round_names[number] = round_data['name']
+        round_matches = rounds[number] = []
+        for values in round_data['matches']:
+            match = SimpleNamespace(round_number=number, **dict(zip(ARCHIVE_MATCH_FIELDS, values)))
+            match.player1 = players.get(match.player1_id)
+            match.player2 = players.get(match.player2_id)
+            match.winner = players.get(match.winner_id)
+            round_matches.append(match)
+    
+    matches = [match for round_matches in rounds.values() for match in round_matches]
+    final_match = None
+    if rounds:
+        final_match = next((match for match in rounds[max(rounds)] if match.is_completed), None)
+    return {
+        'rounds': rounds,
+        'participants_count': len(snapshot['participants']),
+        'matches_count': len(matches),
+        'completed_count': sum(1 for match in matches if match.is_completed),
+        'final_match': final_match,
+    }, round_names
+
+def snapshot_user_ids(snapshot):
+    """Все участники снимка: список участников и игроки его матчей"""
+    return set(snapshot['participants']) | {
+        user_id
+        for round_data in snapshot['rounds'] for values in round_data['matches']
+        for user_id in (values[2], values[3], values[4]) if user_id is not None
+    }
+
+def snapshot_stats_deltas(snapshot):
+    """Вклад матчей снимка в статистику (по тем же правилам, что user_stats_deltas)"""
+    elimination = snapshot['tournament']['format'] == 'single_elimination'
+    last_round = snapshot['rounds'][-1]['number'] if snapshot['rounds'] else None
+    parts = []
+    for round_data in snapshot['rounds']:
+        for values in round_data['matches']:
+            match = dict(zip(ARCHIVE_MATCH_FIELDS, values))
+            if not match['is_completed'] or match['player1_id'] is None or match['player2_id'] is None:
+                continue
+            if match['position'] is not None:
+                is_final = match['next_match_id'] is None
+            else:
+                is_final = round_data['number'] == last_round
+            winner_id = match['winner_id']
+            loser_id = match['player2_id'] if winner_id == match['player1_id'] else match['player1_id']
+            parts.append({
+                winner_id: (1, 1, 1 if elimination and is_final else 0),
+                loser_id: (1, 0, 0),
+            })
+    return merge_stats_deltas(*parts)
+
+def archive_stats_deltas(*criteria, executor=None):
+    """Вклад архивных турниров, чьи матчи удалены из рабочих таблиц, в статистику.
+    
+    Титулы турниров с таблицей здесь не считаются - их дает standings_title_deltas
+    по строке турнира, которая остается. Удаленные участники пропускаются.
+    """
+    executor = executor or db.session
+    parts = [
+        snapshot_stats_deltas(decode_snapshot(data))
+        for (data,) in executor.execute(
+            db.select(TournamentArchive.data).where(TournamentArchive.rows_removed == True, *criteria)
+        )
+    ]
+    deltas = merge_stats_deltas(*parts)
+    if not deltas:
+        return deltas
+    existing = {
+        user_id for (user_id,) in executor.execute(db.select(User.id).where(User.id.in_(list(deltas))))
+    }
+    return {user_id: values for user_id, values in deltas.items() if user_id in existing}
+
+def archive_tournament(tournament, remove_rows=False):
+    """Сохраняет снимок завершенного турнира; remove_rows - удалить его матчи.
+    
+    Статистика участников не меняется: матчи уходят из рабочих таблиц, а их вклад
+    при пересчете берется из снимка (archive_stats_deltas). Строки участников
+    остаются, к ним добавляются игроки матчей не из списка участников (старые
+    сетки): user_links не дает удалить тех, без кого снимок не восстановить.
+    Коммит - за вызывающим.
+    """
+    archive = db.session.get(TournamentArchive, tournament.id)
+    if archive is not None and archive.rows_removed:
+        # Живых строк уже нет, снимок актуален
+        return archive
+    snapshot = build_tournament_snapshot(tournament)
+    data = encode_snapshot(snapshot)
+    if archive is None:
+        archive = TournamentArchive(tournament_id=tournament.id)
+        db.session.add(archive)
+    archive.data = data
+    archive.rows_removed = remove_rows
+    archive.created_at = datetime.utcnow()
+    if remove_rows:
+        Match.query.filter_by(tournament_id=tournament.id).delete()
+        players = snapshot_user_ids(snapshot) - set(snapshot['participants'])
+        if players:
+            db.session.execute(TournamentParticipant.__table__.insert(), [
+                {'tournament_id': tournament.id, 'user_id': user_id} for user_id in sorted(players)
+            ])
+    bump_bracket_version(tournament.id)
+    return archive
+
+def restore_tournament(archive):
+    """Возвращает турнир из архива в рабочие таблицы и удаляет снимок.
     
-    # Определяем общее количество раундов на основе количества участников
-    total_participants = len(tournament.participants)
-    total_rounds = math.ceil(math.log2(total_participants)) if total_participants > 1 else 1
+    Если строки удалялись, матчи вставляются заново, а строки участников
+    заменяются списком из снимка: раунды - от последнего к первому, как в create_tournament_bracket, чтобы ссылки на
+    следующий матч указывали на новые id. Возвращает сообщение об ошибке или None.
+    """
+    tournament_id = archive.tournament_id
+    if archive.rows_removed:
+        snapshot = decode_snapshot(archive.data)
+        user_ids = snapshot_user_ids(snapshot)
+        existing = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+        if existing != user_ids:
+            missing = sorted(snapshot['players'].get(str(user_id), str(user_id)) for user_id in user_ids - existing)
+            return f'Удалены участники турнира: {", ".join(missing[:10])}'
+        
+        TournamentParticipant.query.filter_by(tournament_id=tournament_id).delete()
+        if snapshot['participants']:
+            db.session.execute(TournamentParticipant.__table__.insert(), [
+                {'tournament_id': tournament_id, 'user_id': user_id} for user_id in snapshot['participants']
+            ])
+        new_ids = {}
+        for round_data in reversed(snapshot['rounds']):
+            rows = [dict(zip(ARCHIVE_MATCH_FIELDS, values)) for values in round_data['matches']]
+            old_ids = [row.pop('id') for row in rows]
+            for row in rows:
+                row.update(
+                    tournament_id=tournament_id,
+                    round_number=round_data['number'],
+                    next_match_id=new_ids.get(row['next_match_id']),
+                )
+            db.session.execute(Match.__table__.insert(), rows)
+            inserted = db.session.execute(
+                db.select(Match.id)
+                .filter_by(tournament_id=tournament_id, round_number=round_data['number'])
+                .order_by(Match.position, Match.id)
+            ).scalars().all()
+            new_ids.update(zip(old_ids, inserted))
+    
+    db.session.delete(archive)
+    bump_bracket_version(tournament_id)
+    return None
+
+@bp.route('/tournament/<int:tournament_id>/archive', methods=['POST'])
+@admin_required
+@write_transaction
+def archive_tournament_route(tournament_id):
+    """Архивирует завершенный турнир, remove_rows=1 - с удалением строк из рабочих таблиц"""
+    tournament = Tournament.query.get_or_404(tournament_id)
+    if tournament.status != 'completed':
+        flash('Архивировать можно только завершенный турнир!', 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
+    
+    archive = archive_tournament(tournament, remove_rows=request.form.get('remove_rows') == '1')
+    db.session.commit()
+    bracket_cache.invalidate(tournament_id)
+    if archive.rows_removed:
+        flash(f'Турнир "{tournament.name}" перенесен в архив, строки удалены из рабочих таблиц', 'success')
+    else:
+        flash(f'Турнир "{tournament.name}" перенесен в архив', 'success')
+    return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
+
+@bp.route('/tournament/<int:tournament_id>/restore', methods=['POST'])
+@admin_required
+@write_transaction
+def restore_tournament_route(tournament_id):
+    """Возвращает турнир из архива"""
+    archive = TournamentArchive.query.get_or_404(tournament_id)
+    error = restore_tournament(archive)
+    if error:
+        db.session.rollback()
+        flash(f'Не удалось восстановить турнир. {error}', 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
+    
+    db.session.commit()
+    bracket_cache.invalidate(tournament_id)
+    flash('Турнир восстановлен из архива', 'success')
+    return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
+
+@bp.route('/tournament/<int:tournament_id>/events')
+def tournament_events(tournament_id):
+    """Поток Server-Sent Events с изменениями сетки турнира"""
+    current = db.session.query(Tournament.version).filter_by(id=tournament_id).scalar()
+    if current is None:
+        abort(404)
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', current, type=int)
+    heartbeat = current_app.config['SSE_HEARTBEAT']
+    # Генератор работает после выхода из контекста запроса
+    app = current_app._get_current_object()
+    # Администратор получает матчи с кнопками выбора победителя, зрители - без них
+    key = (tournament_id, bool(session.get('admin_logged_in')))
     
-    # Создаем словарь названий раундов
-    round_names = {}
-    for round_num in rounds.keys():
-        round_names[round_num] = get_round_name(round_num, total_rounds)
+    def stream():
+        cursor = since
+        channel = bracket_events.subscribe(key)
+        try:
+            yield 'retry: 3000\n\n'
+            if current > cursor:
+                # Клиент отстал еще до подключения
+                yield 'event: reload\ndata: {}\n\n'
+                return
+            while True:
+                events = bracket_events.wait(channel, cursor, heartbeat)
+                if not events:
+                    # Тишина: сверяем версию с базой, ее могли изменить в другом процессе
+                    with app.app_context():
+                        version = db.session.query(Tournament.version).filter_by(id=tournament_id).scalar()
+                    if version is None or version > cursor:
+                        yield 'event: reload\ndata: {}\n\n'
+                        return
+                    yield ': ping\n\n'
+                    continue
+                for version, payload in events:
+                    if payload is None or version != cursor + 1:
+                        yield 'event: reload\ndata: {}\n\n'
+                        return
+                    cursor = version
+                    yield f'id: {version}\nevent: bracket\ndata: {payload}\n\n'
+        finally:
+            bracket_events.unsubscribe(key)
     
-    return render_template('tournament.html', tournament=tournament, rounds=rounds, round_names=round_names)
+    return current_app.response_class(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
 
-@app.route('/set_winner', methods=['POST'])
+@bp.route('/set_winner', methods=['POST'])
 @admin_required
+@write_transaction
 def set_winner():
     match_id = request.form.get('match_id')
-    winner_id = request.form.get('winner_id')
+    winner_id = request.form.get('winner_id', type=int)
     
     match = Match.query.get_or_404(match_id)
-    match.winner_id = int(winner_id)
+    
+    if match.is_completed:
+        flash('Победитель этого матча уже определен!', 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=match.tournament_id))
+    
+    if match.tournament.status == 'completed':
+        # Старые сетки могли быть завершены при оставшихся несыгранных матчах
+        flash('Турнир уже завершен!', 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=match.tournament_id))
+    
+    if match.player1_id is None or match.player2_id is None:
+        flash('Соперник в этом матче еще не определен!', 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=match.tournament_id))
+    
+    if winner_id is None or winner_id not in (match.player1_id, match.player2_id):
+        flash('Победитель должен быть одним из участников матча!', 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=match.tournament_id))
+    
+    match.winner_id = winner_id
     match.is_completed = True
     
     # Получаем информацию о победителе для сообщения
-    winner = User.query.get(int(winner_id))
+    winner = match.player1 if winner_id == match.player1_id else match.player2
     
-    # Проверяем, нужно ли создать матч следующего раунда
-    create_next_round_match(match)
+    tournament_format = tournament_format_of(match.tournament)
+    tournament_id = match.tournament_id
+    was_completed = match.tournament.status == 'completed'
+    try:
+        tournament_completed, next_matches = tournament_format.advance(match)
+    except BracketError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+        return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
+    # Титул и поздравление - только за переход турнира в завершенные этим результатом
+    completed_now = tournament_completed and not was_completed
+    # Матч и те, в которые попал победитель, - для живого обновления у зрителей
+    changed_matches = None if next_matches is None else [match] + next_matches
     
+    apply_user_stats(result_stats_deltas([match], completed_now, tournament_format))
+    
+    version = bump_bracket_version(tournament_id)[tournament_id]
     db.session.commit()
+    bracket_cache.invalidate(tournament_id)
+    publish_bracket_update(
+        tournament_id, version, changed_matches,
+        'completed' if tournament_completed else 'active'
+    )
     
-    # Проверяем, повлияло ли это на создание следующего раунда
-    next_round_matches = Match.query.filter_by(
-        tournament_id=match.tournament_id,
-        round_number=match.round_number + 1
-    ).count()
+    if completed_now:
+        champion = match.tournament.winner if tournament_format.uses_standings else winner
+        flash(f'🎉 ТУРНИР ЗАВЕРШЕН! Победитель турнира: {champion.name if champion else winner.name}! 🏆', 'success')
+    elif tournament_format.uses_standings:
+        flash(f'Победитель матча {winner.name} определен!', 'success')
+    else:
+        flash(f'Победитель {winner.name} определен и перешел в следующий раунд!', 'success')
     
-    # Проверяем общее количество завершенных матчей в текущем раунде
-    completed_in_current_round = Match.query.filter_by(
-        tournament_id=match.tournament_id,
-        round_number=match.round_number,
-        is_completed=True
-    ).count()
+    return redirect(url_for('main.tournament_view', tournament_id=match.tournament_id))
+
+def result_stats_deltas(matches, tournament_completed, tournament_format):
+    """Приращения статистики за записанные результаты матчей (в порядке записи).
     
-    total_in_current_round = Match.query.filter_by(
-        tournament_id=match.tournament_id,
-        round_number=match.round_number
-    ).count()
+    Сыгранный матч - обоим игрокам, победа - победителю; если турнир завершен,
+    титул - победителю сыгранного финала (последнего матча) или первому месту
+    итоговой таблицы.
+    """
+    parts = []
+    for match in matches:
+        loser_id = match.player2_id if match.winner_id == match.player1_id else match.player1_id
+        if loser_id is not None:
+            parts.append({match.winner_id: (1, 1, 0), loser_id: (1, 0, 0)})
+    if tournament_completed and matches:
+        last = matches[-1]
+        # Правило то же, что в user_stats_deltas: финал - матч без следующего матча,
+        # в сетках без слотов - матч последнего раунда. Если турнир завершил другой матч
+        # (финал без игры после удаления соперника, старая сетка с нечетным числом
+        # победителей), титула нет
+        if tournament_format.uses_standings:
+            champion_id = last.tournament.winner_id
+        elif last.position is not None:
+            champion_id = last.winner_id if last.next_match_id is None else None
+        else:
+            last_round = db.session.query(func.max(Match.round_number)).filter(
+                Match.tournament_id == last.tournament_id
+            ).scalar()
+            champion_id = last.winner_id if last.round_number == last_round else None
+        if champion_id is not None:
+            parts.append({champion_id: (0, 0, 1)})
+    return merge_stats_deltas(*parts)
+
+def parse_batch_results():
+    """Результаты пакета из JSON или формы: список (match_id, победитель) или строка ошибки.
     
-    # Проверяем, завершен ли турнир
-    tournament = Tournament.query.get(match.tournament_id)
-    if tournament and tournament.status == 'completed':
-        flash(f'🎉 ТУРНИР ЗАВЕРШЕН! Победитель турнира: {winner.name}! 🏆', 'success')
-    elif next_round_matches > 0:
-        flash(f'Победитель {winner.name} определен и перешел в следующий раунд!', 'success')
-    elif completed_in_current_round == total_in_current_round:
-        flash(f'Победитель {winner.name} определен! Следующий раунд создан!', 'success')
-    else:
-        flash(f'Победитель {winner.name} определен! Осталось {total_in_current_round - completed_in_current_round} матчей в раунде.', 'success')
+    JSON - {"results": [{"match_id": 1, "winner_id": 2}, ...]} или сам список;
+    вместо winner_id можно передать winner - имя игрока. Форма - поле results,
+    по строке на матч: номер матча и id или имя победителя через пробел, запятую
+    или точку с запятой.
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        items = payload.get('results') if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            raise ApiError('Ожидается список результатов')
+        parsed = []
+        for item in items:
+            if not isinstance(item, dict):
+                parsed.append('Элемент должен быть объектом с match_id и winner_id')
+                continue
+            winner = item.get('winner_id', item.get('winner'))
+            parsed.append((item.get('match_id'), winner))
+        return parsed
+    
+    parsed = []
+    for line in request.form.get('results', '').splitlines():
+        parts = re.split(r'[\s,;]+', line.strip(), maxsplit=1)
+        if parts == ['']:
+            # Пустые строки пропускаются, но сохраняют нумерацию строк в сообщениях об ошибках
+            parsed.append(None)
+            continue
+        parsed.append((parts[0], parts[1]) if len(parts) == 2 else f'Не указан победитель: {line.strip()}')
+    return parsed
+
+@bp.route('/tournament/<int:tournament_id>/results', methods=['POST'])
+@admin_required
+@write_transaction
+def submit_results(tournament_id):
+    """Пакетная запись результатов матчей одного турнира.
+    
+    Все упомянутые матчи (вместе с игроками и следующими матчами) загружаются
+    одним запросом и применяются в порядке раундов в одной транзакции:
+    результаты первого раунда сразу заполняют слоты следующего, поэтому в одном
+    пакете могут быть несколько раундов. Ошибочные элементы пропускаются и
+    возвращаются списком, остальные записываются; версия сетки увеличивается
+    один раз.
+    """
+    tournament = Tournament.query.get_or_404(tournament_id)
+    tournament_format = tournament_format_of(tournament)
+    
+    items, errors = [], []
+    for index, item in enumerate(parse_batch_results()):
+        if item is None:
+            continue
+        if isinstance(item, str):
+            errors.append({'index': index, 'error': item})
+            continue
+        match_id, winner = item
+        try:
+            match_id = int(match_id)
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'match_id': match_id, 'error': 'Некорректный номер матча'})
+            continue
+        items.append((index, match_id, str(winner).strip() if winner is not None else ''))
     
-    return redirect(url_for('tournament_view', tournament_id=match.tournament_id))
+    # Проверка пакета: один запрос на все матчи и следующие за ними
+    match_ids = {match_id for _, match_id, _ in items}
+    following = aliased(Match)
+    matches = {
+        match.id: match for match in
+        Match.query
+        .filter(Match.tournament_id == tournament_id, or_(
+            Match.id.in_(match_ids),
+            Match.id.in_(db.select(following.next_match_id).where(following.id.in_(match_ids)))
+        ))
+        .options(joinedload(Match.player1), joinedload(Match.player2))
+    } if match_ids else {}
+    
+    # Имена для победителей, указанных по имени: игроки следующих матчей, попавшие туда
+    # внутри пакета, тоже есть среди игроков загруженных матчей
+    names = {
+        user.id: user.name
+        for match in matches.values() for user in (match.player1, match.player2) if user is not None
+    }
+    
+    def order(item):
+        match = matches.get(item[1])
+        return (match.round_number, match.position or 0, match.id) if match else (0, 0, 0)
+    
+    applied, changed_matches, seen = [], [], set()
+    was_completed = tournament_completed = tournament.status == 'completed'
+    for index, match_id, winner in sorted(items, key=order):
+        match = matches.get(match_id)
+        error = None
+        if match is None:
+            error = 'Матч не найден в этом турнире'
+        elif tournament.status == 'completed':
+            # Завершен до пакета или предыдущим результатом пакета
+            error = 'Турнир уже завершен'
+        elif match_id in seen:
+            error = 'Повторный результат для этого матча в пакете'
+        elif match.is_completed:
+            error = 'Победитель этого матча уже определен'
+        elif match.player1_id is None or match.player2_id is None:
+            error = 'Соперник в этом матче еще не определен'
+        else:
+            players = (match.player1_id, match.player2_id)
+            winner_id = int(winner) if winner.isdigit() else next(
+                (user_id for user_id in players if names.get(user_id, '').lower() == winner.lower()), None
+            )
+            if winner_id not in players:
+                error = 'Победитель должен быть одним из участников матча'
+        seen.add(match_id)
+        if error:
+            errors.append({'index': index, 'match_id': match_id, 'error': error})
+            continue
+        
+        match.winner_id = winner_id
+        match.is_completed = True
+        applied.append(match)
+        # Олимпийская система продвигается сразу: следующий раунд пакета увидит победителя.
+        # Форматам с таблицей достаточно одного продвижения в конце
+        if not tournament_format.advance_once:
+            try:
+                tournament_completed, next_matches = tournament_format.advance(match)
+            except BracketError as e:
+                # Часть слотов уже могла измениться, поэтому пакет не записывается целиком
+                db.session.rollback()
+                if request.is_json:
+                    raise ApiError(str(e))
+                flash(str(e), 'error')
+                return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
+            changed_matches = None if changed_matches is None or next_matches is None else changed_matches + next_matches
+    
+    if applied and tournament_format.advance_once:
+        tournament_completed, next_matches = tournament_format.advance(applied[-1])
+        changed_matches = None if next_matches is None else next_matches
+    
+    version = tournament.version
+    if applied:
+        apply_user_stats(result_stats_deltas(applied, tournament_completed and not was_completed, tournament_format))
+        version = bump_bracket_version(tournament_id)[tournament_id]
+        db.session.commit()
+        bracket_cache.invalidate(tournament_id)
+        publish_bracket_update(
+            tournament_id, version,
+            None if changed_matches is None else applied + changed_matches,
+            'completed' if tournament_completed else 'active'
+        )
+    errors.sort(key=lambda error: error['index'])
+    
+    if request.is_json:
+        return jsonify(
+            applied=[match.id for match in applied],
+            errors=errors,
+            status='completed' if tournament_completed else 'active',
+            version=version,
+        )
+    
+    if applied:
+        flash(f'Записано результатов: {len(applied)}', 'success')
+    if tournament_completed and not was_completed:
+        champion = tournament.winner if tournament_format.uses_standings else applied[-1].winner
+        flash(f'🎉 ТУРНИР ЗАВЕРШЕН! Победитель турнира: {champion.name}! 🏆', 'success')
+    for error in errors[:10]:
+        prefix = f'Матч {error["match_id"]}' if 'match_id' in error else f'Строка {error["index"] + 1}'
+        flash(f'{prefix}: {error["error"]}', 'error')
+    if len(errors) > 10:
+        flash(f'И еще ошибок: {len(errors) - 10}', 'error')
+    return redirect(url_for('main.tournament_view', tournament_id=tournament_id))
 
 def create_next_round_match(current_match):
-    """Создает матч следующего раунда, если это необходимо"""
+    """Создает матч следующего раунда для сеток без слотов (созданных до advance_winner)"""
     tournament_id = current_match.tournament_id
     current_round = current_match.round_number
     next_round = current_round + 1
@@ -465,8 +2628,698 @@ def get_round_name(round_number, total_rounds):
     else:
         return f"Раунд {round_number}"
 
+# JSON API только для чтения. Списки отдаются страницами по ключу (keyset):
+# курсор кодирует ключ сортировки последней записи, OFFSET не используется.
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+TOURNAMENT_FIELDS = ('id', 'name', 'status', 'format', 'rounds_total', 'winner_id', 'created_at', 'updated_at', 'version')
+TOURNAMENT_LIST_FIELDS = ('id', 'name', 'status', 'format', 'created_at')
+USER_FIELDS = ('id', 'name', 'tag', 'created_at')
+USER_LIST_FIELDS = ('id', 'name', 'tag')
+MATCH_FIELDS = ('id', 'round_number', 'position', 'player1_id', 'player2_id', 'winner_id', 'is_completed', 'is_bye')
+
+class ApiError(Exception):
+    """Ошибка запроса к API, отдается клиенту как JSON с кодом 400"""
+
+@bp.app_errorhandler(ApiError)
+def handle_api_error(error):
+    if request.path.startswith('/api/') or request.is_json:
+        return jsonify(error=str(error)), 400
+    return str(error), 400
+
+def tournament_columns(fields):
+    return [getattr(Tournament, field) for field in fields]
+
+def user_columns(fields):
+    return [getattr(User, field) for field in fields]
+
+def parse_fields(allowed, default):
+    """Разбирает параметр fields=a,b,c; неизвестные поля - ошибка"""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+def parse_limit():
+    limit = request.args.get('limit', API_PAGE_SIZE, type=int)
+    return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, order_by):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(order_by):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if value is not None and isinstance(column.type, db.DateTime) else value
+            for column, value in zip(order_by, values)
+        ]
+    except (ValueError, TypeError):
+        raise ApiError('Некорректный курсор')
+
+def keyset_page(query, order_by, cursor=None, limit=API_PAGE_SIZE, descending=True):
+    """Возвращает страницу строк и курсор следующей страницы (или None).
+    
+    order_by - столбцы уникального ключа сортировки (последний - id); запрос
+    должен выбирать их, чтобы из последней строки можно было построить курсор.
+    Следующая страница начинается строго после ключа курсора, поэтому глубина
+    страницы не влияет на стоимость запроса при наличии индекса по ключу.
+    """
+    if cursor:
+        values = decode_cursor(cursor, order_by)
+        # (a, b) < (va, vb) в развернутом виде: работает в любой СУБД
+        condition = None
+        for i in reversed(range(len(order_by))):
+            column, value = order_by[i], values[i]
+            after = column < value if descending else column > value
+            if condition is None:
+                condition = after
+            else:
+                condition = or_(after, and_(column == value, condition))
+        query = query.filter(condition)
+    
+    ordering = [column.desc() if descending else column.asc() for column in order_by]
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in order_by])
+    return rows, next_cursor
+
+def group_counts(column, ids):
+    """Количество строк по каждому значению column среди ids одним GROUP BY"""
+    if not ids:
+        return {}
+    return dict(
+        db.session.query(column, func.count()).filter(column.in_(ids)).group_by(column).all()
+    )
+
+def serialize_row(row, fields):
+    data = {}
+    for field in fields:
+        value = getattr(row, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+@bp.route('/api/tournaments')
+def api_tournaments():
+    """Список турниров, новые первыми"""
+    fields = parse_fields(TOURNAMENT_FIELDS, TOURNAMENT_LIST_FIELDS)
+    query = db.session.query(*tournament_columns(dict.fromkeys(fields + ['created_at', 'id'])))
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Tournament.status == status)
+    rows, next_cursor = keyset_page(query, (Tournament.created_at, Tournament.id), request.args.get('cursor'), parse_limit())
+    return jsonify(items=[serialize_row(row, fields) for row in rows], next_cursor=next_cursor)
+
+@bp.route('/api/tournaments/<int:tournament_id>')
+def api_tournament(tournament_id):
+    """Турнирная сетка: матчи по раундам и словарь имен участников"""
+    fields = parse_fields(MATCH_FIELDS, MATCH_FIELDS)
+    tournament = (
+        db.session.query(*tournament_columns(TOURNAMENT_FIELDS), TournamentArchive.data.label('archive_data'))
+        .outerjoin(TournamentArchive, TournamentArchive.tournament_id == Tournament.id)
+        .filter(Tournament.id == tournament_id)
+        .first()
+    )
+    if tournament is None:
+        return jsonify(error='Турнир не найден'), 404
+    
+    if tournament.archive_data is not None:
+        # Архивный турнир отдается из снимка без запросов к матчам
+        snapshot = decode_snapshot(tournament.archive_data)
+        return jsonify(
+            **serialize_row(tournament, TOURNAMENT_FIELDS),
+            archived=True,
+            players={int(user_id): name for user_id, name in snapshot['players'].items()},
+            rounds=[
+                {
+                    'number': round_data['number'],
+                    'name': round_data['name'],
+                    'matches': [
+                        {field: match[field] for field in fields}
+                        for match in (
+                            dict(zip(ARCHIVE_MATCH_FIELDS, values), round_number=round_data['number'])
+                            for values in round_data['matches']
+                        )
+                    ],
+                }
+                for round_data in snapshot['rounds']
+            ]
+        )
+    
+    matches = (
+        db.session.query(*[getattr(Match, field) for field in dict.fromkeys(fields + ['round_number'])])
+        .filter(Match.tournament_id == tournament_id)
+        .order_by(Match.round_number, Match.position, Match.id)
+        .all()
+    )
+    players = (
+        db.session.query(User.id, User.name)
+        .join(TournamentParticipant, TournamentParticipant.user_id == User.id)
+        .filter(TournamentParticipant.tournament_id == tournament_id)
+        .all()
+    )
+    
+    tournament_format = tournament_format_of(tournament)
+    total_rounds = tournament_format.total_rounds(tournament, len(players))
+    rounds = {}
+    for match in matches:
+        rounds.setdefault(match.round_number, []).append(serialize_row(match, fields))
+    
+    return jsonify(
+        **serialize_row(tournament, TOURNAMENT_FIELDS),
+        archived=False,
+        players={user_id: name for user_id, name in players},
+        rounds=[
+            {'number': number, 'name': tournament_format.round_name(number, total_rounds), 'matches': round_matches}
+            for number, round_matches in rounds.items()
+        ]
+    )
+
+def search_users(query, prefix=None, tag=None):
+    """Фильтры поиска участников, оба используют индексы.
+    
+    prefix - начало имени: диапазон name >= prefix AND name < prefix + U+FFFF
+    по ix_user_name (LIKE в SQLite индекс не использует и не знает регистра
+    кириллицы), поэтому ищется как введено, со строчной и с заглавной первой
+    буквой, а также целиком строчными, целиком заглавными и с заглавной только
+    первой буквой.
+    tag - точное совпадение по ix_user_tag_name, пустая строка - участники без метки.
+    """
+    if prefix:
+        variants = {
+            prefix, prefix.lower(), prefix.upper(), prefix.capitalize(),
+            prefix[:1].upper() + prefix[1:], prefix[:1].lower() + prefix[1:],
+        }
+        query = query.filter(or_(*[
+            and_(User.name >= variant, User.name < variant + '\uffff') for variant in variants
+        ]))
+    if tag is not None:
+        query = query.filter(User.tag == tag if tag else or_(User.tag.is_(None), User.tag == ''))
+    return query
+
+@bp.route('/api/users')
+@admin_required
+def api_users():
+    """Участники: по умолчанию новые первыми, order=name - по алфавиту.
+    
+    q - поиск по началу имени, tag - точная метка (tag= без значения - без метки);
+    с любым из них результаты идут по алфавиту.
+    """
+    fields = parse_fields(USER_FIELDS, USER_LIST_FIELDS)
+    prefix, tag = request.args.get('q', '').strip(), request.args.get('tag')
+    if request.args.get('order') == 'name' or prefix or tag is not None:
+        order_by, descending = (User.name, User.id), False
+    else:
+        order_by, descending = (User.created_at, User.id), True
+    query = db.session.query(*user_columns(dict.fromkeys(fields + [column.key for column in order_by])))
+    query = search_users(query, prefix, tag)
+    rows, next_cursor = keyset_page(query, order_by, request.args.get('cursor'), parse_limit(), descending)
+    return jsonify(items=[serialize_row(row, fields) for row in rows], next_cursor=next_cursor)
+
+LEADERBOARD_SORTS = {
+    'wins': UserStats.wins,
+    'matches_played': UserStats.matches_played,
+    'tournaments_won': UserStats.tournaments_won,
+    # Без сыгранных матчей доля побед - 0: деление на ноль в PostgreSQL - ошибка, а NULL
+    # сортируется в разных СУБД по-разному
+    'win_rate': func.coalesce(UserStats.wins * 1.0 / func.nullif(UserStats.matches_played, 0), 0),
+}
+
+@bp.route('/api/leaderboard')
+def api_leaderboard():
+    """Таблица лидеров из UserStats: по участникам или, с group=tag, по меткам.
+    
+    Параметры: sort (wins, matches_played, tournaments_won, win_rate), limit,
+    min_matches - минимум сыгранных матчей (полезно для win_rate), tag - только одна метка.
+    """
+    sort = request.args.get('sort', 'wins')
+    if sort not in LEADERBOARD_SORTS:
+        raise ApiError(f'Неизвестная сортировка: {sort}')
+    limit = parse_limit()
+    min_matches = request.args.get('min_matches', 1, type=int)
+    tag = request.args.get('tag')
+    
+    if request.args.get('group') == 'tag':
+        played = func.sum(UserStats.matches_played)
+        wins = func.sum(UserStats.wins)
+        titles = func.sum(UserStats.tournaments_won)
+        sort_column = {
+            'wins': wins, 'matches_played': played, 'tournaments_won': titles,
+            'win_rate': func.coalesce(wins * 1.0 / func.nullif(played, 0), 0),
+        }[sort]
+        query = (
+            db.session.query(User.tag, played, wins, titles)
+            .join(UserStats, UserStats.user_id == User.id)
+            .group_by(User.tag)
+            .having(played >= min_matches)
+        )
+        if tag:
+            query = query.filter(User.tag == tag)
+        rows = query.order_by(sort_column.desc(), User.tag).limit(limit).all()
+        items = [
+            {'tag': row_tag, 'matches_played': row_played, 'wins': row_wins, 'tournaments_won': row_titles,
+             'win_rate': round(row_wins / row_played, 4) if row_played else 0.0}
+            for row_tag, row_played, row_wins, row_titles in rows
+        ]
+        return jsonify(items=items)
+    
+    query = (
+        db.session.query(User.id, User.name, User.tag, UserStats.matches_played, UserStats.wins, UserStats.tournaments_won)
+        .join(User, User.id == UserStats.user_id)
+        .filter(UserStats.matches_played >= min_matches)
+    )
+    if tag:
+        query = query.filter(User.tag == tag)
+    rows = query.order_by(LEADERBOARD_SORTS[sort].desc(), UserStats.user_id).limit(limit).all()
+    items = [
+        {'id': user_id, 'name': name, 'tag': user_tag, 'matches_played': played, 'wins': wins,
+         'tournaments_won': titles, 'win_rate': round(wins / played, 4) if played else 0.0}
+        for user_id, name, user_tag, played, wins, titles in rows
+    ]
+    return jsonify(items=items)
+
+# Резервное копирование: потоковый экспорт и импорт всей базы.
+# Таблицы перечислены в порядке зависимостей, первое поле - ключ, по которому
+# строки читаются страницами. Статистика не выгружается: после импорта она
+# пересчитывается, учетные записи администраторов не переносятся.
+EXPORT_TABLES = OrderedDict([
+    ('users', (User, ('id', 'name', 'tag', 'created_at'))),
+    ('tournaments', (Tournament, (
+        'id', 'name', 'status', 'format', 'rounds_total', 'winner_id', 'version', 'created_at', 'updated_at',
+    ))),
+    ('participants', (TournamentParticipant, ('id', 'tournament_id', 'user_id'))),
+    ('matches', (Match, (
+        'id', 'tournament_id', 'round_number', 'position', 'player1_id', 'player2_id', 'winner_id',
+        'is_completed', 'is_bye', 'next_match_id', 'next_slot',
+    ))),
+    ('archives', (TournamentArchive, ('tournament_id', 'data', 'rows_removed', 'created_at'))),
+])
+EXPORT_FORMAT_VERSION = 1
+EXPORT_CHUNK_SIZE = 1000
+
+class DataImportError(Exception):
+    """Ошибка в файле импорта; сообщение начинается с места в файле (имя:строка)"""
+
+def iter_export_chunks(table, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки таблицы пачками по ключу: WHERE key > последний ORDER BY key LIMIT n.
+    
+    В памяти держится одна пачка кортежей без ORM-объектов, стоимость запроса
+    не растет с номером пачки. Все пачки читаются в одной транзакции сессии,
+    поэтому выгрузка согласована.
+    """
+    model, fields = EXPORT_TABLES[table]
+    columns = [getattr(model, field) for field in fields]
+    key = columns[0]
+    last = None
+    while True:
+        query = db.session.query(*columns)
+        if last is not None:
+            query = query.filter(key > last)
+        rows = query.order_by(key).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+def export_ndjson(tables=tuple(EXPORT_TABLES)):
+    """Выгрузка в NDJSON: строка meta, затем по объекту на запись с полем table"""
+    yield json.dumps({'table': 'meta', 'format_version': EXPORT_FORMAT_VERSION, 'tables': list(tables)}) + '\n'
+    for table in tables:
+        fields = EXPORT_TABLES[table][1]
+        for rows in iter_export_chunks(table):
+            yield ''.join(
+                json.dumps(
+                    {'table': table, **{field: export_value(value) for field, value in zip(fields, row)}},
+                    ensure_ascii=False, separators=(',', ':')
+                ) + '\n'
+                for row in rows
+            )
+
+def export_csv(table):
+    """Выгрузка одной таблицы в CSV с заголовком; пустая ячейка - NULL, логические значения - 1/0"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_TABLES[table][1])
+    for rows in iter_export_chunks(table):
+        writer.writerows(
+            ['' if value is None else int(value) if isinstance(value, bool) else export_value(value) for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Пустая таблица - только заголовок
+        yield buffer.getvalue()
+
+def parse_import_value(column, raw):
+    """Значение из NDJSON или CSV в тип столбца; пустая строка - NULL"""
+    if raw is None or raw == '':
+        return None
+    python_type = column.type.python_type
+    if python_type is bool:
+        return raw if isinstance(raw, bool) else str(raw).strip().lower() in ('1', 'true')
+    if python_type is int:
+        return int(raw)
+    if python_type is datetime:
+        return datetime.fromisoformat(raw)
+    if python_type is bytes:
+        return base64.b64decode(raw, validate=True)
+    return str(raw)
+
+def read_ndjson_records(stream, filename):
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise DataImportError(f'{filename}:{line_no}: строка не является JSON')
+        if not isinstance(record, dict):
+            raise DataImportError(f'{filename}:{line_no}: ожидается JSON-объект')
+        table = record.pop('table', None)
+        if table == 'meta':
+            if record.get('format_version', 1) > EXPORT_FORMAT_VERSION:
+                raise DataImportError(f'{filename}: файл выгружен более новой версией приложения')
+            continue
+        yield f'{filename}:{line_no}', table, record
+
+def read_csv_records(stream, table, filename):
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    for line_no, row in enumerate(reader, 2):
+        if row:
+            yield f'{filename}:{line_no}', table, dict(zip(header, row))
+
+def import_table_of(filename):
+    """Таблица CSV файла по его имени (users.csv, matches.csv...); None - NDJSON"""
+    stem, extension = os.path.splitext(os.path.basename(filename or ''))
+    if extension.lower() != '.csv':
+        return None
+    if stem not in EXPORT_TABLES:
+        raise DataImportError(f'{filename}: имя CSV файла должно быть одним из: {", ".join(EXPORT_TABLES)}')
+    return stem
+
+def read_import_stream(stream, filename):
+    table = import_table_of(filename)
+    if table is None:
+        return read_ndjson_records(stream, filename)
+    return read_csv_records(stream, table, filename)
+
+def read_import_files(file_storages):
+    """Записи загруженных файлов: CSV - в порядке зависимостей таблиц, как в read_users_file"""
+    tables = list(EXPORT_TABLES)
+    order = {id(file_storage): import_table_of(file_storage.filename) for file_storage in file_storages}
+    for file_storage in sorted(file_storages, key=lambda f: tables.index(order[id(f)]) if order[id(f)] else -1):
+        file_storage.stream.seek(0)
+        stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+        try:
+            yield from read_import_stream(stream, file_storage.filename)
+        finally:
+            stream.detach()
+
+class DataImporter:
+    """Загружает записи выгрузки пачками по IMPORT_BATCH_SIZE строк.
+    
+    Идентификаторы турниров, участий и матчей сдвигаются на текущий максимум
+    своей таблицы, поэтому словари соответствий для них не нужны и память не
+    растет с размером выгрузки; в пустой базе id сохраняются. Участники с уже
+    существующим именем сопоставляются с ним, остальные получают новый id -
+    это единственный словарь в памяти. Ссылки на следующий матч вперед по id
+    (старые сетки) проставляются одним UPDATE в конце. Коммит - за вызывающим.
+    """
+    
+    def __init__(self):
+        self.offsets = {
+            table: db.session.query(func.max(getattr(model, fields[0]))).scalar() or 0
+            for table, (model, fields) in EXPORT_TABLES.items()
+        }
+        self.columns = {
+            table: [(field, model.__table__.c[field]) for field in fields]
+            for table, (model, fields) in EXPORT_TABLES.items()
+        }
+        self.user_ids = {}
+        self.tournament_ids = set()
+        self.deferred_links = []
+        self.counts = dict.fromkeys(EXPORT_TABLES, 0)
+        self.merged_users = 0
+        self.table = None
+        self.batch = []
+    
+    def add(self, location, table, record):
+        if table not in EXPORT_TABLES:
+            raise DataImportError(f'{location}: неизвестная таблица {table!r}')
+        if table != self.table:
+            tables = list(EXPORT_TABLES)
+            if self.table is not None and tables.index(table) < tables.index(self.table):
+                raise DataImportError(f'{location}: записи должны идти в порядке таблиц: {", ".join(tables)}')
+            self.flush()
+            self.table = table
+        
+        unknown = set(record) - {field for field, _ in self.columns[table]}
+        if unknown:
+            raise DataImportError(f'{location}: неизвестные поля {", ".join(sorted(unknown))}')
+        values = {}
+        try:
+            for field, column in self.columns[table]:
+                try:
+                    value = parse_import_value(column, record.get(field))
+                except (ValueError, TypeError):
+                    raise ValueError(f'некорректное значение поля {field}: {record.get(field)!r}')
+                if value is None and column.default is not None:
+                    value = column.default.arg(None) if column.default.is_callable else column.default.arg
+                if value is None and not column.nullable:
+                    raise ValueError(f'нет значения поля {field}')
+                values[field] = value
+            row = getattr(self, f'_remap_{table}')(values)
+        except LookupError as e:
+            raise DataImportError(f'{location}: ссылка на отсутствующую запись: {e.args[0]}')
+        except ValueError as e:
+            raise DataImportError(f'{location}: {e}')
+        
+        self.batch.append(row)
+        if len(self.batch) >= IMPORT_BATCH_SIZE:
+            self.flush()
+    
+    def _user(self, user_id):
+        if user_id is None:
+            return None
+        if user_id not in self.user_ids:
+            raise LookupError(f'участник {user_id}')
+        return self.user_ids[user_id]
+    
+    def _tournament(self, tournament_id):
+        if tournament_id not in self.tournament_ids:
+            raise LookupError(f'турнир {tournament_id}')
+        return tournament_id + self.offsets['tournaments']
+    
+    def _remap_users(self, values):
+        # Новые id назначаются в flush, после сверки имен с базой
+        return values
+    
+    def _remap_tournaments(self, values):
+        self.tournament_ids.add(values['id'])
+        values['id'] += self.offsets['tournaments']
+        values['winner_id'] = self._user(values['winner_id'])
+        return values
+    
+    def _remap_participants(self, values):
+        values['id'] += self.offsets['participants']
+        values['tournament_id'] = self._tournament(values['tournament_id'])
+        values['user_id'] = self._user(values['user_id'])
+        return values
+    
+    def _remap_matches(self, values):
+        old_id = values['id']
+        values['id'] += self.offsets['matches']
+        values['tournament_id'] = self._tournament(values['tournament_id'])
+        for field in ('player1_id', 'player2_id', 'winner_id'):
+            values[field] = self._user(values[field])
+        next_id = values['next_match_id']
+        if next_id is not None:
+            if next_id < old_id:
+                values['next_match_id'] = next_id + self.offsets['matches']
+            else:
+                # Следующий матч еще не вставлен
+                self.deferred_links.append({'b_id': values['id'], 'b_next_id': next_id + self.offsets['matches']})
+                values['next_match_id'] = None
+        return values
+    
+    def _remap_archives(self, values):
+        values['tournament_id'] = self._tournament(values['tournament_id'])
+        snapshot = decode_snapshot(values['data'])
+        
+        # В снимке могут быть участники, удаленные после архивации: они получают
+        # отрицательные id, которые не совпадут ни с кем (restore_tournament сообщит о них)
+        def user_id(old):
+            return None if old is None else self.user_ids.get(old, -abs(old))
+        
+        snapshot['tournament']['id'] = values['tournament_id']
+        snapshot['tournament']['winner_id'] = user_id(snapshot['tournament']['winner_id'])
+        snapshot['participants'] = [user_id(old) for old in snapshot['participants']]
+        snapshot['players'] = {str(user_id(int(old))): name for old, name in snapshot['players'].items()}
+        for round_data in snapshot['rounds']:
+            for match in round_data['matches']:
+                match[2:5] = [user_id(old) for old in match[2:5]]
+        values['data'] = encode_snapshot(snapshot)
+        return values
+    
+    def flush(self):
+        if not self.batch:
+            return
+        table, batch = self.table, self.batch
+        self.batch = []
+        if table == 'users':
+            batch = self._merge_users(batch)
+        if batch:
+            db.session.execute(EXPORT_TABLES[table][0].__table__.insert(), batch)
+        self.counts[table] += len(batch)
+    
+    def _merge_users(self, batch):
+        """Сопоставляет пачку участников с существующими по имени, возвращает новых"""
+        existing = dict(
+            db.session.query(User.name, User.id).filter(User.name.in_({row['name'] for row in batch}))
+        )
+        new_rows = []
+        for row in batch:
+            old_id = row['id']
+            if row['name'] in existing:
+                self.user_ids[old_id] = existing[row['name']]
+                self.merged_users += 1
+                continue
+            row['id'] = old_id + self.offsets['users']
+            self.user_ids[old_id] = existing[row['name']] = row['id']
+            new_rows.append(row)
+        return new_rows
+    
+    def finish(self):
+        """Дописывает последнюю пачку, отложенные ссылки, счетчики id и статистику"""
+        self.flush()
+        if self.deferred_links:
+            table = Match.__table__
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('b_id')).values(next_match_id=bindparam('b_next_id')),
+                self.deferred_links
+            )
+        if db.engine.dialect.name == 'postgresql':
+            # Строки вставлены с явными id - сдвигаем последовательности
+            for model, fields in EXPORT_TABLES.values():
+                if fields[0] == 'id':
+                    db.session.execute(db.text(
+                        f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+                        f'(SELECT COALESCE(MAX(id), 1) FROM "{model.__tablename__}"))'
+                    ))
+        rebuild_user_stats()
+    
+    @property
+    def imported_tournament_ids(self):
+        return [tournament_id + self.offsets['tournaments'] for tournament_id in self.tournament_ids]
+    
+    def summary(self):
+        return (
+            f'участников: {self.counts["users"]} (совпали по имени: {self.merged_users}), '
+            f'турниров: {self.counts["tournaments"]}, участий: {self.counts["participants"]}, '
+            f'матчей: {self.counts["matches"]}, архивов: {self.counts["archives"]}'
+        )
+
+def import_data(records):
+    """Импортирует записи (место, таблица, поля) и возвращает DataImporter со счетчиками"""
+    importer = DataImporter()
+    for location, table, record in records:
+        importer.add(location, table, record)
+    importer.finish()
+    return importer
+
+@bp.route('/admin/data')
+@admin_required
+def admin_data():
+    """Страница резервного копирования: выгрузка и загрузка базы"""
+    return render_template('admin_data.html', tables=list(EXPORT_TABLES))
+
+@bp.route('/admin/export')
+@admin_required
+def admin_export():
+    """Потоковая выгрузка: format=ndjson - вся база, format=csv&table=... - одна таблица"""
+    export_format = request.args.get('format', 'ndjson')
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M')
+    if export_format == 'csv':
+        table = request.args.get('table')
+        if table not in EXPORT_TABLES:
+            abort(400)
+        body, mimetype, filename = export_csv(table), 'text/csv', f'{table}.csv'
+    elif export_format == 'ndjson':
+        body, mimetype, filename = export_ndjson(), 'application/x-ndjson', f'tournament-{stamp}.ndjson'
+    else:
+        abort(400)
+    return current_app.response_class(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no',
+    })
+
+@bp.route('/admin/import', methods=['POST'])
+@admin_required
+@write_transaction
+def admin_import():
+    """Загружает выгрузку NDJSON или набор CSV файлов (users.csv, tournaments.csv...) одной транзакцией"""
+    files = [file_storage for file_storage in request.files.getlist('files') if file_storage.filename]
+    if not files:
+        flash('Выберите файлы для импорта', 'error')
+        return redirect(url_for('main.admin_data'))
+    
+    try:
+        importer = import_data(read_import_files(files))
+        db.session.commit()
+    except DataImportError as e:
+        db.session.rollback()
+        flash(f'Импорт отменен. {e}', 'error')
+        return redirect(url_for('main.admin_data'))
+    
+    bracket_cache.invalidate(*importer.imported_tournament_ids)
+    flash(f'Импортировано {importer.summary()}', 'success')
+    return redirect(url_for('main.admin_data'))
+
+@bp.route('/admin/profiling', methods=['GET', 'POST'])
+@admin_required
+def admin_profiling():
+    """Сводка профилирования по маршрутам этого процесса; POST сбрасывает ее"""
+    if request.method == 'POST':
+        request_profiler.reset()
+        flash('Статистика профилирования сброшена', 'success')
+        return redirect(url_for('main.admin_profiling'))
+    routes = sorted(request_profiler.snapshot().items(), key=lambda item: item[1]['wall_ms'], reverse=True)
+    if request.args.get('format') == 'json':
+        return jsonify(enabled=current_app.config['PROFILING'], buckets_ms=PROFILE_BUCKETS_MS, routes=dict(routes))
+    return render_template(
+        'admin_profiling.html',
+        routes=routes, buckets=PROFILE_BUCKETS_MS,
+        enabled=current_app.config['PROFILING'], slow_ms=current_app.config['SLOW_REQUEST_MS']
+    )
+
 # Роуты для авторизации администратора
-@app.route('/admin/login', methods=['GET', 'POST'])
+@bp.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -478,25 +3331,26 @@ def admin_login():
             session['admin_logged_in'] = True
             session['admin_username'] = username
             flash('Вы успешно вошли в систему!', 'success')
-            return redirect(url_for('admin'))
+            return redirect(url_for('main.admin'))
         else:
             flash('Неверное имя пользователя или пароль!', 'error')
     
     return render_template('admin_login.html')
 
-@app.route('/admin/logout')
+@bp.route('/admin/logout')
 def admin_logout():
     session.pop('admin_logged_in', None)
     session.pop('admin_username', None)
     flash('Вы вышли из системы', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/admin/setup', methods=['GET', 'POST'])
+@bp.route('/admin/setup', methods=['GET', 'POST'])
+@write_transaction
 def admin_setup():
     # Проверяем, есть ли уже администраторы
     if AdminUser.query.count() > 0:
         flash('Администратор уже настроен!', 'error')
-        return redirect(url_for('admin_login'))
+        return redirect(url_for('main.admin_login'))
     
     if request.method == 'POST':
         username = request.form.get('username')
@@ -505,21 +3359,21 @@ def admin_setup():
         
         if not username or not password:
             flash('Все поля обязательны для заполнения!', 'error')
-            return redirect(url_for('admin_setup'))
+            return redirect(url_for('main.admin_setup'))
         
         if password != confirm_password:
             flash('Пароли не совпадают!', 'error')
-            return redirect(url_for('admin_setup'))
+            return redirect(url_for('main.admin_setup'))
         
         if len(password) < 6:
             flash('Пароль должен содержать минимум 6 символов!', 'error')
-            return redirect(url_for('admin_setup'))
+            return redirect(url_for('main.admin_setup'))
         
         # Проверяем, не существует ли уже администратор с таким именем
         existing_admin = AdminUser.query.filter_by(username=username).first()
         if existing_admin:
             flash('Администратор с таким именем пользователя уже существует!', 'error')
-            return redirect(url_for('admin_setup'))
+            return redirect(url_for('main.admin_setup'))
         
         try:
             # Создаем администратора
@@ -529,15 +3383,286 @@ def admin_setup():
             db.session.commit()
             
             flash('Администратор создан успешно! Теперь вы можете войти в систему.', 'success')
-            return redirect(url_for('admin_login'))
+            return redirect(url_for('main.admin_login'))
         except Exception as e:
             db.session.rollback()
+            if is_contention_error(e):
+                raise
             flash('Ошибка при создании администратора. Попробуйте другое имя пользователя.', 'error')
-            return redirect(url_for('admin_setup'))
+            return redirect(url_for('main.admin_setup'))
     
     return render_template('admin_setup.html')
 
-if __name__ == '__main__':
+# Миграции схемы. Каждая функция получает соединение внутри транзакции и должна
+# быть идемпотентной: на новой базе db.create_all() уже создал все колонки и индексы.
+def _add_columns(connection, table, columns):
+    existing = {column['name'] for column in db.inspect(connection).get_columns(table)}
+    quoted = connection.dialect.identifier_preparer.quote(table)
+    for name, ddl in columns.items():
+        if name not in existing:
+            connection.execute(db.text(f'ALTER TABLE {quoted} ADD COLUMN {name} {ddl}'))
+
+def _create_indexes(connection, model, names):
+    for index in model.__table__.indexes:
+        if index.name in names:
+            index.create(connection, checkfirst=True)
+
+def migration_1_bracket_slots(connection):
+    """Слоты матчей для пошагового продвижения по сетке"""
+    _add_columns(connection, 'match', {
+        'position': 'INTEGER',
+        'next_match_id': f'INTEGER REFERENCES {connection.dialect.identifier_preparer.quote("match")} (id)',
+        'next_slot': 'INTEGER',
+        'is_bye': 'BOOLEAN DEFAULT FALSE',
+    })
+
+def migration_2_lookup_indexes(connection):
+    """Индексы для выборок сетки, проверок при удалении и поиска по имени"""
+    _create_indexes(connection, Match, {
+        'ix_match_tournament_round', 'ix_match_player1_id', 'ix_match_player2_id', 'ix_match_winner_id',
+    })
+    _create_indexes(connection, TournamentParticipant, {
+        'ix_tournament_participant_tournament_id', 'ix_tournament_participant_user_id',
+    })
+    _create_indexes(connection, User, {'ix_user_name'})
+
+def migration_3_tournament_version(connection):
+    """Версия сетки турнира для кэша страниц и ETag"""
+    _add_columns(connection, 'tournament', {
+        'version': 'INTEGER NOT NULL DEFAULT 1',
+        'updated_at': db.DateTime().compile(dialect=connection.dialect),
+    })
+    connection.execute(db.text('UPDATE tournament SET updated_at = created_at WHERE updated_at IS NULL'))
+
+def migration_4_created_at_indexes(connection):
+    """Индексы для постраничного вывода турниров и участников"""
+    _create_indexes(connection, Tournament, {'ix_tournament_created_at'})
+    _create_indexes(connection, User, {'ix_user_created_at'})
+
+def migration_5_user_stats(connection):
+    """Таблица статистики участников (заполняется пересчетом в migration_6: пересчет
+    использует столбцы формата турнира)"""
+    UserStats.__table__.create(connection, checkfirst=True)
+
+def migration_6_tournament_formats(connection):
+    """Формат турнира, число туров и победитель по таблице; пересчет статистики"""
+    _add_columns(connection, 'tournament', {
+        'format': "VARCHAR(20) NOT NULL DEFAULT 'single_elimination'",
+        'rounds_total': 'INTEGER',
+        'winner_id': f'INTEGER REFERENCES {connection.dialect.identifier_preparer.quote("user")} (id)',
+    })
+    rebuild_user_stats(connection)
+
+def migration_7_tournament_archive(connection):
+    """Таблица снимков завершенных турниров"""
+    TournamentArchive.__table__.create(connection, checkfirst=True)
+
+def migration_8_user_tag_index(connection):
+    """Индекс для поиска участников по метке"""
+    _create_indexes(connection, User, {'ix_user_tag_name'})
+
+def migration_9_archive_participants(connection):
+    """Строки участников турниров, архивированных с удалением строк: раньше они
+    удалялись, и участника снимка можно было удалить, после чего турнир не
+    восстанавливался. Уже удаленные участники пропускаются"""
+    archives = connection.execute(
+        db.select(TournamentArchive.tournament_id, TournamentArchive.data)
+        .where(TournamentArchive.rows_removed == True)
+    ).all()
+    for tournament_id, data in archives:
+        snapshot = decode_snapshot(data)
+        present = set(connection.scalars(
+            db.select(TournamentParticipant.user_id).where(TournamentParticipant.tournament_id == tournament_id)
+        ))
+        missing = snapshot_user_ids(snapshot) - present
+        if not missing:
+            continue
+        existing = set(connection.scalars(db.select(User.id).where(User.id.in_(missing))))
+        # Сначала участники в порядке снимка, затем прочие игроки матчей
+        order = {user_id: index for index, user_id in enumerate(snapshot['participants'])}
+        rows = [
+            {'tournament_id': tournament_id, 'user_id': user_id}
+            for user_id in sorted(existing, key=lambda user_id: (order.get(user_id, len(order)), user_id))
+        ]
+        if rows:
+            connection.execute(TournamentParticipant.__table__.insert(), rows)
+
+MIGRATIONS = [
+    (1, migration_1_bracket_slots),
+    (2, migration_2_lookup_indexes),
+    (3, migration_3_tournament_version),
+    (4, migration_4_created_at_indexes),
+    (5, migration_5_user_stats),
+    (6, migration_6_tournament_formats),
+    (7, migration_7_tournament_archive),
+    (8, migration_8_user_tag_index),
+    (9, migration_9_archive_participants),
+]
+
+def upgrade_schema():
+    """Создает недостающие таблицы и применяет к базе еще не примененные миграции"""
+    db.create_all()
+    current = db.session.query(func.max(SchemaVersion.version)).scalar() or 0
+    db.session.remove()
+    
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.engine.begin() as connection:
+            migration(connection)
+            connection.execute(SchemaVersion.__table__.insert().values(
+                version=version, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+@bp.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Пересчитывает статистику участников с нуля"""
+    count = rebuild_user_stats()
+    db.session.commit()
+    click.echo(f'Статистика пересчитана для участников: {count}')
+
+@bp.cli.command('archive-tournaments')
+@click.option('--remove-rows', is_flag=True, help='удалить матчи из рабочих таблиц')
+@click.option('--days', type=int, default=0, help='только турниры, завершенные не менее N дней назад')
+def archive_tournaments_command(remove_rows, days):
+    """Переносит завершенные турниры в архив, по одному коммиту на турнир"""
+    query = (
+        db.session.query(Tournament.id)
+        .outerjoin(TournamentArchive, TournamentArchive.tournament_id == Tournament.id)
+        .filter(Tournament.status == 'completed', TournamentArchive.tournament_id.is_(None))
+    )
+    if days:
+        query = query.filter(Tournament.updated_at <= datetime.utcnow() - timedelta(days=days))
+    tournament_ids = [tournament_id for (tournament_id,) in query.order_by(Tournament.id)]
+    for tournament_id in tournament_ids:
+        archive_tournament(db.session.get(Tournament, tournament_id), remove_rows=remove_rows)
+        db.session.commit()
+        bracket_cache.invalidate(tournament_id)
+    click.echo(f'Перенесено в архив турниров: {len(tournament_ids)}')
+
+@bp.cli.command('export-data')
+@click.argument('output')
+@click.option('--format', 'export_format', type=click.Choice(['ndjson', 'csv']), default='ndjson',
+              help='ndjson - один файл (- для stdout), csv - каталог с файлом на таблицу')
+def export_data_command(output, export_format):
+    """Выгружает всю базу потоково, без загрузки таблиц в память"""
+    if export_format == 'csv':
+        os.makedirs(output, exist_ok=True)
+        for table in EXPORT_TABLES:
+            with open(os.path.join(output, f'{table}.csv'), 'w', encoding='utf-8', newline='') as f:
+                f.writelines(export_csv(table))
+    elif output == '-':
+        sys.stdout.writelines(export_ndjson())
+        return
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.writelines(export_ndjson())
+    click.echo(f'Выгрузка записана: {output}')
+
+@bp.cli.command('import-data')
+@click.argument('path', type=click.Path(exists=True))
+def import_data_command(path):
+    """Загружает выгрузку: файл NDJSON или каталог с CSV файлами таблиц"""
+    with contextlib.ExitStack() as stack:
+        if os.path.isdir(path):
+            names = [f'{table}.csv' for table in EXPORT_TABLES if os.path.exists(os.path.join(path, f'{table}.csv'))]
+            records = itertools.chain.from_iterable(
+                read_import_stream(
+                    stack.enter_context(open(os.path.join(path, name), encoding='utf-8-sig', newline='')), name
+                )
+                for name in names
+            )
+        else:
+            records = read_import_stream(stack.enter_context(open(path, encoding='utf-8-sig', newline='')), path)
+        try:
+            importer = import_data(records)
+            db.session.commit()
+        except DataImportError as e:
+            db.session.rollback()
+            raise click.ClickException(str(e))
+    click.echo(f'Импортировано {importer.summary()}')
+
+@bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Применяет миграции схемы к базе данных"""
+    applied = current_app.extensions.get('migrations_applied', []) + upgrade_schema()
+    if applied:
+        click.echo(f'Применены миграции: {", ".join(map(str, applied))}')
+    else:
+        click.echo('База данных в актуальном состоянии')
+
+# Запуск. create_app(config) собирает приложение: настройки по умолчанию (часть -
+# из окружения) и поверх них config, движок базы с параметрами из этих настроек,
+# маршруты этого модуля. Затем приложение готовится к приему запросов: применяются
+# миграции и процесс прогревается - компилируются все шаблоны, считаются хэши
+# статических файлов и открывается соединение с базой, чтобы первый запрос не
+# платил за это. Боевой запуск - через WSGI-сервер с несколькими процессами (wsgi.py
+# и gunicorn.conf.py): мастер вызывает create_app() один раз, а каждый рабочий
+# процесс после fork только открывает свои соединения (init_worker). Кэши сетки и
+# подписки SSE у каждого процесса свои; изменения из других процессов видны по
+# версии сетки в базе.
+
+_warmed = threading.Event()
+
+def warm_up(app):
+    """Компилирует шаблоны, загружает статические файлы и открывает соединение с базой"""
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        for root, _, files in os.walk(app.static_folder):
+            for name in files:
+                load_asset(os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, '/'))
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+    _warmed.set()
+
+def create_app(config=None):
+    """Создает приложение с настройками config, применяет миграции и прогревает процесс"""
+    app = Flask(__name__)
+    load_config(app, config)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+    if app.config['SLOW_LOG_FILE']:
+        add_slow_log_file(app.config['SLOW_LOG_FILE'])
+    db.init_app(app)
+    app.register_blueprint(bp)
+    with app.app_context():
+        configure_sqlite_engine(db.engine, app.config)
+        # Их показывает flask upgrade-db: CLI создает приложение через create_app
+        app.extensions['migrations_applied'] = upgrade_schema()
+    warm_up(app)
+    return app
+
+def init_worker(app):
+    """Вызывается в рабочем процессе после fork: соединения мастера не переиспользуются"""
+    _warmed.clear()
     with app.app_context():
-        db.create_all()
-    app.run(debug=False)
+        db.engine.dispose(close=False)
+    warm_up(app)
+
+@bp.route('/readyz')
+def readyz():
+    """Проверка готовности для балансировщика: база отвечает и схема обновлена.
+    
+    Не зависит от способа запуска (gunicorn, flask run, тестовый клиент); прогрет
+    ли процесс, видно в поле warm.
+    """
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except DBAPIError:
+        return jsonify({'status': 'database unavailable'}), 503
+    try:
+        version = db.session.query(func.max(SchemaVersion.version)).scalar()
+    except DBAPIError:
+        # Таблицы миграций еще нет: база не обновлялась
+        db.session.rollback()
+        version = None
+    if version != MIGRATIONS[-1][0]:
+        return jsonify({'status': 'schema outdated', 'schema_version': version}), 503
+    return jsonify({'status': 'ready', 'warm': _warmed.is_set(), 'pid': os.getpid()})
+
+if __name__ == '__main__':
+    # Встроенный однопроцессный сервер - для разработки
+    create_app().run(debug=False)
@@ -0,0 +1,256 @@
+"""Нагрузочный бенчмарк турнирной системы на синтетических данных.
+
+Запускается на временной SQLite базе через тестовый клиент Flask:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json
+    python benchmark.py --compare before.json after.json
+
+Для каждого сценария в JSON выводятся перцентили задержки (мс), число SQL-запросов
+на операцию и пиковое потребление памяти Python (tracemalloc, отдельным прогоном,
+чтобы трассировка не искажала время).
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+from app import (
+    create_app, db, Match, User, bracket_cache, compute_standings, import_users, pair_swiss_round, upgrade_schema,
+)
+
+_workdir = tempfile.mkdtemp(prefix='tournament-bench-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+DATABASE_URL = 'sqlite:///' + os.path.join(_workdir, 'bench.db')
+app = create_app({'SQLALCHEMY_DATABASE_URI': DATABASE_URL})
+
+TAGS = ['Группа А', 'Группа Б', 'Новички', 'Профи', 'Школа 1', 'Школа 2', None]
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные движком приложения"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, queries, peak_memory):
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p90_ms': round(percentile(latencies, 90), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies), 3) if latencies else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'queries_p50': percentile(queries, 50),
+        'queries_max': max(queries) if queries else 0,
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+class SyntheticMatch:
+    """Сыгранный матч в памяти для замеров швейцарской жеребьевки"""
+    is_completed = True
+
+    def __init__(self, player1_id, player2_id, winner_id):
+        self.player1_id, self.player2_id, self.winner_id = player1_id, player2_id, winner_id
+
+
+def swiss_round(players, matches, byes):
+    """Таблица, сортировка и жеребьевка одного тура - то, что делает SwissFormat.advance без SQL"""
+    table = compute_standings(matches)
+    no_history = {'score': 0, 'buchholz': 0}
+    ranking = sorted(players, key=lambda p: (-table.get(p, no_history)['score'], -table.get(p, no_history)['buchholz']))
+    return pair_swiss_round(ranking, table, byes)
+
+
+class Benchmark:
+    def __init__(self, users, seed):
+        random.seed(seed)
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session['admin_logged_in'] = True
+            session['admin_username'] = 'bench'
+        with app.app_context():
+            upgrade_schema()
+            self.counter = QueryCounter(db.engine)
+            import_users(((f'Игрок {i:06d}', random.choice(TAGS)) for i in range(users)))
+            db.session.commit()
+            self.user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        self.results = {}
+
+    def measure(self, name, operation, repeat):
+        """Выполняет operation() repeat раз, затем еще раз под tracemalloc"""
+        latencies, queries = [], []
+        for _ in range(repeat):
+            self.counter.count = 0
+            started = time.perf_counter()
+            operation()
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(self.counter.count)
+
+        tracemalloc.start()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.results[name] = summarize(latencies, queries, peak)
+        print(f'{name}: p50 {self.results[name]["p50_ms"]} мс, '
+              f'запросов {self.results[name]["queries_p50"]}', file=sys.stderr)
+
+    def request(self, method, url, **kwargs):
+        response = getattr(self.client, method)(url, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method.upper()} {url}: {response.status_code}')
+        return response
+
+    def clear_flashes(self):
+        """Редиректы не открываются, поэтому flash-сообщения копились бы в сессии"""
+        with self.client.session_transaction() as session:
+            session.pop('_flashes', None)
+
+    def create_tournament(self, size):
+        self.request('post', '/create_tournament', data={
+            'tournament_name': f'Бенчмарк {size}',
+            'selected_users': [str(user_id) for user_id in random.sample(self.user_ids, size)],
+        })
+        self.clear_flashes()
+        with app.app_context():
+            return db.session.query(db.func.max(Match.tournament_id)).scalar()
+
+    def play_tournament(self, tournament_id):
+        """Проводит все матчи турнира до финала, замеряя каждый set_winner"""
+        with app.app_context():
+            pending = [
+                (match.id, match.round_number)
+                for match in Match.query.filter_by(tournament_id=tournament_id).order_by(Match.round_number, Match.id)
+                if not match.is_completed
+            ]
+        latencies, queries = [], []
+        for match_id, _ in pending:
+            with app.app_context():
+                match = db.session.get(Match, match_id)
+                if match.is_completed or match.player1_id is None or match.player2_id is None:
+                    continue
+                winner_id = random.choice([match.player1_id, match.player2_id])
+            self.counter.count = 0
+            started = time.perf_counter()
+            self.request('post', '/set_winner', data={'match_id': match_id, 'winner_id': winner_id})
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(self.counter.count)
+            self.clear_flashes()
+        return latencies, queries
+
+    def run(self, sizes, repeat):
+        for size in sizes:
+            self.measure(f'create_tournament_{size}', lambda: self.create_tournament(size), repeat)
+
+        for size in sizes:
+            tournament_id = self.create_tournament(size)
+
+            # Отрисовка без кэша и повторные просмотры с кэшем
+            def view_cold():
+                bracket_cache.invalidate(tournament_id)
+                self.request('get', f'/tournament/{tournament_id}')
+            self.measure(f'tournament_view_cold_{size}', view_cold, repeat)
+            self.measure(f'tournament_view_warm_{size}',
+                         lambda: self.request('get', f'/tournament/{tournament_id}'), repeat)
+
+            tracemalloc.start()
+            latencies, queries = self.play_tournament(tournament_id)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.results[f'set_winner_to_final_{size}'] = summarize(latencies, queries, peak)
+            print(f'set_winner_to_final_{size}: {len(latencies)} результатов', file=sys.stderr)
+
+            self.measure(f'tournament_view_completed_{size}', view_cold, repeat)
+
+        # Жеребьевка последнего тура швейцарской системы после log2(size) - 1 сыгранных
+        for size in sizes:
+            players = random.sample(self.user_ids, size)
+            matches, byes = [], set()
+            for _ in range(max(1, math.ceil(math.log2(size))) - 1):
+                pairs, bye = swiss_round(players, matches, byes)
+                matches.extend(SyntheticMatch(a, b, random.choice((a, b))) for a, b in pairs)
+                if bye is not None:
+                    byes.add(bye)
+                    matches.append(SyntheticMatch(bye, None, bye))
+            self.measure(f'swiss_pairing_{size}', lambda: swiss_round(players, matches, byes), repeat)
+
+        self.measure('admin', lambda: self.request('get', '/admin'), repeat)
+        self.measure('index', lambda: self.request('get', '/'), repeat)
+        return self.results
+
+
+def compare(before_path, after_path):
+    """Печатает изменение p50/p99 и числа запросов между двумя прогонами"""
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)['results']
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)['results']
+
+    print(f'{"сценарий":40} {"p50 было":>10} {"p50 стало":>10} {"p99 было":>10} {"p99 стало":>10} {"запросы":>12}')
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name), after.get(name)
+        if old is None or new is None:
+            print(f'{name:40} {"только в " + ("новом" if old is None else "старом"):>54}')
+            continue
+        print(f'{name:40} {old["p50_ms"]:>10} {new["p50_ms"]:>10} {old["p99_ms"]:>10} {new["p99_ms"]:>10} '
+              f'{str(old["queries_p50"]) + "->" + str(new["queries_p50"]):>12}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000, help='сколько синтетических участников создать')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 1024, 4096], help='размеры турниров')
+    parser.add_argument('--repeat', type=int, default=5, help='повторов каждого замера')
+    parser.add_argument('--seed', type=int, default=1, help='seed генератора случайных чисел')
+    parser.add_argument('--output', help='файл для JSON с результатами (по умолчанию stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='сравнить два файла результатов')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if max(args.sizes) > args.users:
+        parser.error('размер турнира не может превышать число участников')
+
+    benchmark = Benchmark(args.users, args.seed)
+    results = benchmark.run(args.sizes, args.repeat)
+    report = json.dumps({
+        'params': {'users': args.users, 'sizes': args.sizes, 'repeat': args.repeat, 'seed': args.seed},
+        'python': sys.version.split()[0],
+        'results': results,
+    }, ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Настройки gunicorn для боевого запуска: gunicorn -c gunicorn.conf.py wsgi:app
+
+Приложение загружается и прогревается один раз в мастере (preload_app), рабочие
+процессы получают скомпилированные шаблоны через fork и открывают свои соединения
+с базой в post_fork. Число процессов, соединений и адрес задаются окружением.
+
+Класс рабочих процессов (WORKER_CLASS) по умолчанию зависит от базы. Для SQLite -
+gthread: драйвер sqlite3 ждет блокировку записи (busy_timeout, до
+SQLITE_BUSY_TIMEOUT_MS) внутри C-кода, и под gevent такое ожидание останавливает
+все гринлеты процесса - и просмотр сетки, и потоки SSE. В gthread ждет только поток
+пишущего запроса, остальные потоки продолжают отвечать; каждый зритель SSE при
+этом занимает поток, их число - WORKER_THREADS. Для серверных СУБД - gevent:
+соединения обслуживаются гринлетами, и тысячи зрителей SSE не занимают потоки ОС;
+ожидание в BracketEvents (threading.Condition) после monkey-патча переключает
+гринлеты. Драйвер PostgreSQL psycopg2 для gevent нужно дополнительно пропатчить
+(psycogreen), чистый Python-драйвер PyMySQL патчится вместе с сокетами.
+"""
+import multiprocessing
+import os
+
+# Та же база, что у приложения (app.py): без DATABASE_URL - файловая SQLite
+database_url = os.environ.get('DATABASE_URL', 'sqlite:///tournament.db')
+worker_class = os.environ.get('WORKER_CLASS', 'gthread' if database_url.startswith('sqlite') else 'gevent')
+if worker_class == 'gevent':
+    # Патч до загрузки приложения: блокировки и Condition модуля app должны быть гринлетовыми
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Одновременных соединений на процесс gevent (включая открытые потоки SSE)
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+# Потоки на процесс gthread: каждый пишущий запрос, ждущий блокировку, и каждый зритель SSE занимают поток
+threads = int(os.environ.get('WORKER_THREADS', 8))
+preload_app = True
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+accesslog = os.environ.get('ACCESS_LOG')
+
+
+def post_fork(server, worker):
+    from app import init_worker
+    # Приложение, загруженное мастером (preload_app)
+    init_worker(worker.app.wsgi())
@@ -0,0 +1,151 @@
+"""Нагрузочный профиль боевого запуска: пропускная способность просмотра сетки
+в зависимости от числа рабочих процессов gunicorn.
+
+Готовит временную SQLite базу с турниром, для каждого числа процессов запускает
+gunicorn -c gunicorn.conf.py wsgi:app, ждет /readyz и нагружает /tournament/<id>
+клиентскими процессами (по --clients на рабочий процесс) с keep-alive соединениями:
+
+    python loadtest.py --workers 1 2 4 --duration 10
+    python loadtest.py --workers 1 2 4 8 --output scaling.json
+
+Клиенты работают на той же машине, поэтому почти линейный рост ожидается, пока
+процессов сервера заметно меньше, чем ядер процессора.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchmark import DATABASE_URL, Benchmark, app, percentile
+
+from app import db
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_ready(port, timeout):
+    """Ждет, пока все процессы сервера не начнут отвечать на /readyz"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def client(port, path, warmup, duration, results):
+    """Закрытый цикл запросов по одному keep-alive соединению"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Accept-Encoding': 'gzip'}
+    latencies = []
+    started = time.perf_counter()
+    measure_from = started + warmup
+    finish = measure_from + duration
+    while True:
+        sent = time.perf_counter()
+        if sent >= finish:
+            break
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'GET {path}: {response.status}')
+        if sent >= measure_from:
+            latencies.append((time.perf_counter() - sent) * 1000)
+    connection.close()
+    results.put(latencies)
+
+
+def run_load(workers, port, path, clients, warmup, duration):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f'127.0.0.1:{port}', DATABASE_URL=DATABASE_URL)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_ready(port, 60):
+            raise RuntimeError(f'сервер с {workers} процессами не ответил на /readyz')
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=client, args=(port, path, warmup, duration, results))
+            for _ in range(workers * clients)
+        ]
+        for process in processes:
+            process.start()
+        latencies = []
+        for _ in processes:
+            latencies.extend(results.get())
+        for process in processes:
+            process.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+    return {
+        'workers': workers,
+        'clients': len(processes),
+        'requests': len(latencies),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='числа рабочих процессов')
+    parser.add_argument('--clients', type=int, default=2, help='клиентских процессов на рабочий процесс')
+    parser.add_argument('--size', type=int, default=64, help='размер турнира')
+    parser.add_argument('--users', type=int, default=1000, help='сколько синтетических участников создать')
+    parser.add_argument('--duration', type=float, default=10, help='длительность замера, секунд')
+    parser.add_argument('--warmup', type=float, default=1, help='разогрев перед замером, секунд')
+    parser.add_argument('--port', type=int, default=8765, help='порт сервера')
+    parser.add_argument('--output', help='файл для JSON с результатами (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    if args.size > args.users:
+        parser.error('размер турнира не может превышать число участников')
+
+    benchmark = Benchmark(args.users, seed=1)
+    path = f'/tournament/{benchmark.create_tournament(args.size)}'
+    # Соединения этого процесса с базой больше не нужны, читать будет сервер
+    with app.app_context():
+        db.engine.dispose()
+
+    results = []
+    for workers in args.workers:
+        result = run_load(workers, args.port, path, args.clients, args.warmup, args.duration)
+        result['speedup'] = round(result['rps'] / results[0]['rps'], 2) if results else 1.0
+        result['efficiency'] = round(result['speedup'] * args.workers[0] / workers, 2)
+        results.append(result)
+        print(f'{workers} процессов: {result["rps"]} запросов/с, p50 {result["p50_ms"]} мс, '
+              f'p99 {result["p99_ms"]} мс, ускорение {result["speedup"]}', file=sys.stderr)
+
+    report = json.dumps({
+        'params': {'size': args.size, 'users': args.users, 'clients_per_worker': args.clients,
+                   'duration': args.duration, 'path': path},
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+        'results': results,
+    }, ensure_ascii=False, indent=2)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
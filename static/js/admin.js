@@ -0,0 +1,189 @@
+// Таблица участников и выбор участников турнира подгружаются страницами с сервера
+function debounce(fn, delay) {
+    let timer;
+    return function() {
+        clearTimeout(timer);
+        timer = setTimeout(fn, delay);
+    };
+}
+
+function searchParams(query, tag, cursor) {
+    const params = new URLSearchParams();
+    if (query) {
+        params.set('q', query);
+    }
+    // '*' - все метки, пустая строка - участники без метки
+    if (tag !== '*') {
+        params.set('tag', tag);
+    }
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    return params;
+}
+
+// Таблица участников: HTML-фрагменты admin_users
+(function() {
+    const rows = document.getElementById('userRows');
+    if (!rows) {
+        return;
+    }
+    const more = document.getElementById('userRowsMore');
+    const search = document.getElementById('userSearch');
+    const tagFilter = document.getElementById('userTagFilter');
+    let nextCursor = null;
+    let requestId = 0;
+    
+    function load(append) {
+        const current = ++requestId;
+        const params = searchParams(search.value.trim(), tagFilter.value, append ? nextCursor : null);
+        fetch(rows.dataset.url + '?' + params, {credentials: 'same-origin'})
+            .then(response => response.text().then(html => [html, response.headers.get('X-Next-Cursor')]))
+            .then(([html, cursor]) => {
+                if (current !== requestId) {
+                    return;
+                }
+                if (append) {
+                    rows.insertAdjacentHTML('beforeend', html);
+                } else {
+                    rows.innerHTML = html.trim() || '<div class="text-muted p-2">Никого не найдено</div>';
+                }
+                nextCursor = cursor;
+                more.classList.toggle('d-none', !cursor);
+            });
+    }
+    
+    search.addEventListener('input', debounce(() => load(false), 250));
+    tagFilter.addEventListener('change', () => load(false));
+    more.addEventListener('click', () => load(true));
+    load(false);
+})();
+
+// Выбор участников турнира: результаты поиска из /api/users, выбранные хранятся отдельно
+const selectedParticipants = new Map();
+const participantsList = document.getElementById('participantsList');
+let participantsCursor = null;
+let participantsRequest = 0;
+
+function participantFilters() {
+    return [document.getElementById('participantSearch').value.trim(), document.getElementById('tagFilter').value];
+}
+
+function fetchParticipants(cursor, limit) {
+    const [query, tag] = participantFilters();
+    const params = searchParams(query, tag, cursor);
+    params.set('order', 'name');
+    params.set('fields', 'id,name,tag');
+    params.set('limit', limit || 100);
+    return fetch(participantsList.dataset.url + '?' + params, {credentials: 'same-origin'})
+        .then(response => response.json());
+}
+
+function renderSelected() {
+    const container = document.getElementById('selectedParticipants');
+    container.innerHTML = '';
+    selectedParticipants.forEach((name, id) => {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = 'selected_users';
+        input.value = id;
+        container.appendChild(input);
+    });
+    document.getElementById('selectedCount').textContent = selectedParticipants.size;
+    const names = Array.from(selectedParticipants.values());
+    document.getElementById('selectedNames').textContent =
+        names.slice(0, 10).join(', ') + (names.length > 10 ? ' и еще ' + (names.length - 10) : '');
+}
+
+function renderParticipant(user) {
+    const item = document.createElement('div');
+    item.className = 'form-check participant-item';
+    const checkbox = document.createElement('input');
+    checkbox.className = 'form-check-input';
+    checkbox.type = 'checkbox';
+    checkbox.id = 'user_' + user.id;
+    checkbox.dataset.userId = user.id;
+    checkbox.checked = selectedParticipants.has(user.id);
+    checkbox.addEventListener('change', () => {
+        if (checkbox.checked) {
+            selectedParticipants.set(user.id, user.name);
+        } else {
+            selectedParticipants.delete(user.id);
+        }
+        renderSelected();
+    });
+    const label = document.createElement('label');
+    label.className = 'form-check-label';
+    label.htmlFor = checkbox.id;
+    label.textContent = user.name + ' ';
+    if (user.tag) {
+        const badge = document.createElement('span');
+        badge.className = 'badge bg-info';
+        badge.style.fontSize = '0.7em';
+        badge.innerHTML = '<i class="fas fa-tag"></i> ';
+        badge.appendChild(document.createTextNode(user.tag));
+        label.appendChild(badge);
+    }
+    item.appendChild(checkbox);
+    item.appendChild(label);
+    participantsList.appendChild(item);
+}
+
+function loadParticipants(append) {
+    if (!participantsList) {
+        return;
+    }
+    const current = ++participantsRequest;
+    fetchParticipants(append ? participantsCursor : null).then(data => {
+        if (current !== participantsRequest) {
+            return;
+        }
+        if (!append) {
+            participantsList.innerHTML = data.items.length ? '' : '<div class="text-muted">Никого не найдено</div>';
+        }
+        data.items.forEach(renderParticipant);
+        participantsCursor = data.next_cursor;
+        document.getElementById('participantsMore').classList.toggle('d-none', !participantsCursor);
+    });
+}
+
+// Выбор всех участников, подходящих под поиск и метку (все страницы)
+function selectAllParticipants() {
+    function page(cursor) {
+        fetchParticipants(cursor, 200).then(data => {
+            data.items.forEach(user => selectedParticipants.set(user.id, user.name));
+            if (data.next_cursor) {
+                page(data.next_cursor);
+            } else {
+                participantsList.querySelectorAll('input[data-user-id]').forEach(checkbox => checkbox.checked = true);
+                renderSelected();
+            }
+        });
+    }
+    page(null);
+}
+
+// Снятие выбора со всех участников
+function selectNoneParticipants() {
+    selectedParticipants.clear();
+    participantsList.querySelectorAll('input[data-user-id]').forEach(checkbox => checkbox.checked = false);
+    renderSelected();
+}
+
+if (participantsList) {
+    document.getElementById('participantSearch').addEventListener('input', debounce(() => loadParticipants(false), 250));
+    document.getElementById('tagFilter').addEventListener('change', () => loadParticipants(false));
+    document.getElementById('participantsMore').addEventListener('click', () => loadParticipants(true));
+    loadParticipants(false);
+}
+
+// Одно окно принудительного удаления на все строки таблицы
+const forceDeleteModal = document.getElementById('forceDeleteModal');
+if (forceDeleteModal) {
+    forceDeleteModal.addEventListener('show.bs.modal', function(event) {
+        const button = event.relatedTarget;
+        forceDeleteModal.querySelector('form').action = button.dataset.action;
+        forceDeleteModal.querySelector('[data-user-name]').textContent = button.dataset.userName;
+        forceDeleteModal.querySelector('input[name="confirm"]').value = '';
+    });
+}
@@ -0,0 +1,74 @@
+// Автообновление страницы каждые 30 секунд для отображения изменений
+setInterval(function() {
+    // Проверяем, есть ли незавершенные матчи
+    const incompleteMatches = document.querySelectorAll('.match:not(.completed)');
+    if (incompleteMatches.length > 0) {
+        // Можно добавить уведомление о необходимости обновления
+        console.log('Есть незавершенные матчи');
+    }
+}, 30000);
+
+// Живое обновление сетки: сервер присылает только изменившиеся матчи
+document.addEventListener('DOMContentLoaded', function() {
+    const bracket = document.querySelector('.tournament-bracket[data-events-url]');
+    if (!bracket || !window.EventSource) {
+        return;
+    }
+    
+    const url = bracket.dataset.eventsUrl + '?since=' + bracket.dataset.bracketVersion;
+    const source = new EventSource(url);
+    
+    source.addEventListener('bracket', function(event) {
+        const data = JSON.parse(event.data);
+        data.matches.forEach(function(match) {
+            const element = bracket.querySelector('.match[data-match-id="' + match.id + '"]');
+            if (element) {
+                element.outerHTML = match.html;
+            }
+        });
+        
+        const counter = document.querySelector('[data-completed-count]');
+        if (counter) {
+            counter.textContent = parseInt(counter.textContent, 10) + data.completed_delta;
+        }
+        
+        // Турнир завершен - один раз перезагружаем страницу с итогами
+        if (data.status === 'completed') {
+            source.close();
+            window.location.reload();
+        }
+    });
+    
+    // Пропущенные события (перезапуск сервера, изменения из другого процесса)
+    source.addEventListener('reload', function() {
+        source.close();
+        window.location.reload();
+    });
+});
+
+// Индикатор прогресса прокрутки для турнирной сетки
+document.addEventListener('DOMContentLoaded', function() {
+    const bracket = document.querySelector('.tournament-bracket');
+    const scrollProgress = document.querySelector('.scroll-progress');
+    
+    if (bracket && scrollProgress) {
+        bracket.addEventListener('scroll', function() {
+            const scrollLeft = bracket.scrollLeft;
+            const scrollWidth = bracket.scrollWidth - bracket.clientWidth;
+            const scrollPercentage = (scrollLeft / scrollWidth) * 100;
+            scrollProgress.style.width = scrollPercentage + '%';
+        });
+        
+        // Инициализация при загрузке
+        const scrollWidth = bracket.scrollWidth - bracket.clientWidth;
+        if (scrollWidth > 0) {
+            scrollProgress.style.width = '0%';
+        } else {
+            // Если прокрутка не нужна, скрываем индикатор
+            const indicator = document.querySelector('.scroll-indicator');
+            if (indicator) {
+                indicator.style.display = 'none';
+            }
+        }
+    }
+});
@@ -0,0 +1,93 @@
+"""Общие фикстуры тестов: приложение на временной SQLite базе и клиент администратора"""
+import atexit
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as tournament_app  # noqa: E402
+from app import Match, Tournament, User, create_app, db, import_users, upgrade_schema  # noqa: E402
+
+_workdir = tempfile.mkdtemp(prefix='tournament-tests-')
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+_app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(_workdir, 'test.db')})
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """Приложение с пустой базой и пустым кэшем сеток (id турниров повторяются между тестами)"""
+    monkeypatch.setattr(tournament_app, 'bracket_cache', tournament_app.BracketCache())
+    with _app.app_context():
+        db.drop_all()
+        upgrade_schema()
+    yield _app
+    with _app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+        session['admin_username'] = 'admin'
+    return client
+
+
+def pop_flashes(client):
+    """Flash-сообщения запроса; редиректы не открываются, поэтому они копились бы в сессии"""
+    with client.session_transaction() as session:
+        return session.pop('_flashes', [])
+
+
+@pytest.fixture
+def make_users(app):
+    def make(count, tag=None, prefix='Игрок'):
+        with app.app_context():
+            import_users(((f'{prefix} {i:04d}', tag) for i in range(count)))
+            db.session.commit()
+            return [user_id for (user_id,) in db.session.query(User.id).filter(User.name.like(f'{prefix} %')).order_by(User.id)]
+    return make
+
+
+@pytest.fixture
+def create_tournament(app, admin_client):
+    def create(user_ids, tournament_format='single_elimination', name='Турнир'):
+        response = admin_client.post('/create_tournament', data={
+            'tournament_name': name,
+            'format': tournament_format,
+            'selected_users': [str(user_id) for user_id in user_ids],
+        })
+        assert response.status_code == 302
+        assert all(category != 'error' for category, _ in pop_flashes(admin_client))
+        with app.app_context():
+            return db.session.query(db.func.max(Tournament.id)).scalar()
+    return create
+
+
+@pytest.fixture
+def play(app, admin_client):
+    """Записывает случайные результаты матчей турнира через set_winner (не больше limit)"""
+    rng = random.Random(1)
+
+    def play_matches(tournament_id, limit=None):
+        played = 0
+        while limit is None or played < limit:
+            with app.app_context():
+                match = Match.query.filter(
+                    Match.tournament_id == tournament_id, Match.is_completed == False,
+                    Match.player1_id.isnot(None), Match.player2_id.isnot(None)
+                ).order_by(Match.round_number, Match.id).first()
+                if match is None:
+                    return played
+                match_id, winner_id = match.id, rng.choice([match.player1_id, match.player2_id])
+            admin_client.post('/set_winner', data={'match_id': match_id, 'winner_id': winner_id})
+            assert all(category != 'error' for category, _ in pop_flashes(admin_client))
+            played += 1
+        return played
+    return play_matches
@@ -0,0 +1,29 @@
+"""create_app: настройки, база и движок каждого приложения берутся из переданного config"""
+import os
+
+from app import SchemaVersion, User, create_app, db, import_users
+
+
+def test_apps_use_their_own_database_and_engine_options(app, make_users, tmp_path):
+    make_users(3)
+    other = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp_path, 'other.db'),
+        'DB_POOL_SIZE': 3,
+        'SSE_HEARTBEAT': 1,
+    })
+    assert other is not app
+    assert other.config['SSE_HEARTBEAT'] == 1
+
+    with other.app_context():
+        # Миграции применены при создании, пул - из переданных настроек
+        assert db.session.query(db.func.max(SchemaVersion.version)).scalar() is not None
+        assert db.engine.pool.size() == 3
+        assert db.session.query(User).count() == 0
+        import_users([('Другой', None)])
+        db.session.commit()
+    with app.app_context():
+        assert db.session.query(User).count() == 3
+
+    response = other.test_client().get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
@@ -0,0 +1,59 @@
+"""Живое обновление сетки: администраторы и зрители получают матчи из разных каналов"""
+import json
+
+import pytest
+from flask import template_rendered
+
+from app import Match, bracket_events
+
+from conftest import pop_flashes
+
+
+def publish_result(app, admin_client, tournament_id):
+    """Записывает результат первого матча; возвращает is_admin каждой отрисовки _match.html"""
+    with app.app_context():
+        match = Match.query.filter_by(tournament_id=tournament_id, round_number=1).order_by(Match.position).first()
+        match_id, winner_id = match.id, match.player1_id
+
+    rendered = []
+
+    def on_rendered(sender, template, context, **extra):
+        if template.name == '_match.html':
+            rendered.append(context['is_admin'])
+
+    template_rendered.connect(on_rendered, app)
+    try:
+        admin_client.post('/set_winner', data={'match_id': match_id, 'winner_id': winner_id})
+    finally:
+        template_rendered.disconnect(on_rendered, app)
+    pop_flashes(admin_client)
+    return rendered
+
+
+def received(channel):
+    events = bracket_events.wait(channel, 0, 0)
+    assert len(events) == 1
+    return json.loads(events[0][1])
+
+
+@pytest.mark.parametrize('admin', [False, True])
+def test_channel_gets_only_its_fragment(app, admin_client, make_users, create_tournament, admin):
+    tournament_id = create_tournament(make_users(8))
+    key = (tournament_id, admin)
+    channel = bracket_events.subscribe(key)
+    try:
+        rendered = publish_result(app, admin_client, tournament_id)
+        payload = received(channel)
+    finally:
+        bracket_events.unsubscribe(key)
+
+    # Матч и следующий матч отрисованы один раз - только для канала с подписчиками
+    assert rendered == [admin, admin]
+    assert all(set(match) == {'id', 'html'} for match in payload['matches'])
+    # Номер матча видит только администратор
+    assert all((f'#{match["id"]}</small>' in match['html']) == admin for match in payload['matches'])
+
+
+def test_no_subscribers_no_rendering(app, admin_client, make_users, create_tournament):
+    tournament_id = create_tournament(make_users(8))
+    assert publish_result(app, admin_client, tournament_id) == []
@@ -0,0 +1,48 @@
+"""Число SQL-запросов страницы турнирной сетки не должно зависеть от размера турнира"""
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+# Сейчас страница обходится 5 запросами; N+1 в шаблоне превысит предел уже на сетке из 8 игроков
+MAX_QUERIES = 6
+
+
+def count_queries(app, client, url):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('viewer', ['admin', 'anonymous'])
+def test_tournament_view_query_count_is_constant(app, admin_client, make_users, create_tournament, play, viewer):
+    users = make_users(256)
+    small = create_tournament(users[:8], name='Малый')
+    large = create_tournament(users, name='Большой')
+    # Часть результатов записана: в сетке есть сыгранные, ожидающие и пустые матчи
+    play(small, limit=3)
+    play(large, limit=100)
+
+    client = admin_client if viewer == 'admin' else app.test_client()
+    small_queries = count_queries(app, client, f'/tournament/{small}')
+    large_queries = count_queries(app, client, f'/tournament/{large}')
+
+    assert small_queries == large_queries
+    assert large_queries <= MAX_QUERIES
+
+
+def test_cached_view_does_not_query_bracket(app, admin_client, make_users, create_tournament):
+    tournament_id = create_tournament(make_users(16))
+    count_queries(app, admin_client, f'/tournament/{tournament_id}')
+    assert count_queries(app, admin_client, f'/tournament/{tournament_id}') == 0
@@ -0,0 +1,109 @@
+"""Боевой запуск через gunicorn.conf.py: запись, ждущая блокировку SQLite, не
+останавливает чтение в рабочих процессах"""
+import http.client
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from app import Match, db
+
+pytest.importorskip('gunicorn')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Столько держится блокировка записи; ожидание SQLite (SQLITE_BUSY_TIMEOUT_MS) дольше
+LOCK_SECONDS = 1.5
+# Пишущих запросов меньше, чем потоков процесса: все они могут попасть в один процесс
+THREADS = 8
+WRITES = 4
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request(port, method, path, headers=None, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def server(app):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY='2', WORKER_THREADS=str(THREADS), BIND=f'127.0.0.1:{port}',
+               DATABASE_URL=app.config['SQLALCHEMY_DATABASE_URI'])
+    env.pop('WORKER_CLASS', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if request(port, 'GET', '/readyz') == 200:
+                    break
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, 'сервер не ответил на /readyz'
+            time.sleep(0.1)
+        yield port
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(30)
+
+
+def test_reads_continue_while_writes_wait_for_lock(app, make_users, create_tournament, server):
+    tournament_id = create_tournament(make_users(WRITES * 2))
+    with app.app_context():
+        results = [
+            (match.id, match.player1_id)
+            for match in Match.query.filter_by(tournament_id=tournament_id, round_number=1)
+        ]
+        database = db.engine.url.database
+    cookie = app.session_interface.get_signing_serializer(app).dumps({'admin_logged_in': True})
+    headers = {'Cookie': f'session={cookie}', 'Content-Type': 'application/x-www-form-urlencoded'}
+
+    lock = sqlite3.connect(database, isolation_level=None)
+    lock.execute('BEGIN IMMEDIATE')
+    written = []
+    writers = [
+        threading.Thread(target=lambda match_id=match_id, winner_id=winner_id: written.append(
+            request(server, 'POST', '/set_winner', headers, f'match_id={match_id}&winner_id={winner_id}')
+        ))
+        for match_id, winner_id in results
+    ]
+    started = time.monotonic()
+    for writer in writers:
+        writer.start()
+
+    # Пишущие запросы ждут блокировку в обоих процессах; просмотр сетки отвечает сразу
+    latencies = []
+    while time.monotonic() - started < LOCK_SECONDS:
+        sent = time.monotonic()
+        assert request(server, 'GET', f'/tournament/{tournament_id}') == 200
+        latencies.append(time.monotonic() - sent)
+    lock.rollback()
+    lock.close()
+    for writer in writers:
+        writer.join(30)
+
+    assert len(latencies) > 5
+    assert max(latencies) < LOCK_SECONDS / 3
+    assert written == [302] * len(results)
+    with app.app_context():
+        assert Match.query.filter_by(tournament_id=tournament_id, round_number=1, is_completed=True).count() == len(results)
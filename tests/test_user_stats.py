@@ -0,0 +1,271 @@
+"""Статистика участников, обновляемая приращениями, всегда совпадает с пересчетом с нуля"""
+import random
+
+import pytest
+
+from app import Match, Tournament, TournamentParticipant, UserStats, db, rebuild_user_stats
+
+from conftest import pop_flashes
+
+FORMATS = ['single_elimination', 'swiss', 'round_robin']
+
+
+def assert_stats_match_rebuild(app):
+    def snapshot():
+        return {
+            row.user_id: (row.matches_played, row.wins, row.tournaments_won)
+            for row in UserStats.query
+            if (row.matches_played, row.wins, row.tournaments_won) != (0, 0, 0)
+        }
+
+    with app.app_context():
+        incremental = snapshot()
+        rebuild_user_stats()
+        rebuilt = snapshot()
+        # Пересчет не сохраняется: следующие операции продолжают работать с приращениями
+        db.session.rollback()
+    assert incremental == rebuilt
+
+
+def submit_batch(app, client, tournament_id, rng):
+    """Записывает пакетом результаты всех матчей, в которых уже известны оба игрока"""
+    with app.app_context():
+        results = [
+            {'match_id': match.id, 'winner_id': rng.choice([match.player1_id, match.player2_id])}
+            for match in Match.query.filter(
+                Match.tournament_id == tournament_id, Match.is_completed == False,
+                Match.player1_id.isnot(None), Match.player2_id.isnot(None)
+            )
+        ]
+    if results:
+        response = client.post(f'/tournament/{tournament_id}/results', json={'results': results})
+        assert response.status_code == 200
+        assert response.get_json()['errors'] == []
+    return len(results)
+
+
+@pytest.mark.parametrize('tournament_format', FORMATS)
+def test_set_winner(app, make_users, create_tournament, play, tournament_format):
+    users = make_users(7)
+    tournament_id = create_tournament(users, tournament_format)
+    play(tournament_id, limit=4)
+    assert_stats_match_rebuild(app)
+    play(tournament_id)
+    assert_stats_match_rebuild(app)
+
+
+@pytest.mark.parametrize('tournament_format', FORMATS)
+def test_batch_results(app, admin_client, make_users, create_tournament, tournament_format):
+    rng = random.Random(2)
+    tournament_id = create_tournament(make_users(9), tournament_format)
+    while submit_batch(app, admin_client, tournament_id, rng):
+        assert_stats_match_rebuild(app)
+    assert_stats_match_rebuild(app)
+
+
+@pytest.mark.parametrize('tournament_format', FORMATS)
+def test_delete_tournament(app, admin_client, make_users, create_tournament, play, tournament_format):
+    users = make_users(10)
+    kept = create_tournament(users[:8], tournament_format)
+    deleted = create_tournament(users[2:], tournament_format)
+    play(kept)
+    play(deleted)
+    assert_stats_match_rebuild(app)
+
+    admin_client.post(f'/delete_tournament/{deleted}')
+    assert pop_flashes(admin_client)[0][0] == 'success'
+    assert_stats_match_rebuild(app)
+
+
+@pytest.mark.parametrize('tournament_format', FORMATS)
+def test_force_delete(app, admin_client, make_users, create_tournament, play, tournament_format):
+    users = make_users(8) + make_users(4, tag='Удаляемые', prefix='Гость')
+    finished = create_tournament(users[:8], tournament_format)
+    play(finished)
+    active = create_tournament(users, tournament_format)
+    play(active, limit=3)
+
+    # Участник завершенного и идущего турниров, затем все участники с меткой
+    admin_client.post(f'/force_delete_user/{users[0]}', data={'confirm': 'DELETE_USER'})
+    assert pop_flashes(admin_client)[0][0] == 'warning'
+    assert_stats_match_rebuild(app)
+    admin_client.post('/admin/users/bulk', data={
+        'action': 'force_delete', 'scope': 'tag', 'tag': 'Удаляемые', 'confirm': 'DELETE_USER',
+    })
+    assert pop_flashes(admin_client)[0][0] == 'warning'
+    assert_stats_match_rebuild(app)
+
+    # Турнир доигрывается после удаления
+    play(active)
+    assert_stats_match_rebuild(app)
+
+
+@pytest.mark.parametrize('remove_rows', ['1', '0'])
+@pytest.mark.parametrize('tournament_format', FORMATS)
+def test_archive_and_restore(app, admin_client, make_users, create_tournament, play, tournament_format, remove_rows):
+    users = make_users(8)
+    tournament_id = create_tournament(users, tournament_format)
+    other = create_tournament(users[:5], tournament_format)
+    play(tournament_id)
+    play(other)
+
+    admin_client.post(f'/tournament/{tournament_id}/archive', data={'remove_rows': remove_rows})
+    assert pop_flashes(admin_client)[0][0] == 'success'
+    assert_stats_match_rebuild(app)
+
+    admin_client.post(f'/tournament/{tournament_id}/restore')
+    assert pop_flashes(admin_client)[0][0] == 'success'
+    assert_stats_match_rebuild(app)
+
+    # Удаление архивного турнира вычитает его вклад из снимка
+    admin_client.post(f'/tournament/{tournament_id}/archive', data={'remove_rows': remove_rows})
+    pop_flashes(admin_client)
+    admin_client.post(f'/delete_tournament/{tournament_id}')
+    assert pop_flashes(admin_client)[0][0] == 'success'
+    assert_stats_match_rebuild(app)
+
+
+def test_force_delete_of_archived_participant(app, admin_client, make_users, create_tournament, play):
+    users = make_users(8)
+    tournament_id = create_tournament(users)
+    play(tournament_id)
+    admin_client.post(f'/tournament/{tournament_id}/archive', data={'remove_rows': '1'})
+    pop_flashes(admin_client)
+
+    admin_client.post(f'/force_delete_user/{users[3]}', data={'confirm': 'DELETE_USER'})
+    pop_flashes(admin_client)
+    assert_stats_match_rebuild(app)
+
+
+def test_archived_participant_cannot_be_deleted(app, admin_client, make_users, create_tournament, play):
+    users = make_users(4)
+    tournament_id = create_tournament(users)
+    play(tournament_id)
+    with app.app_context():
+        final = Match.query.filter_by(tournament_id=tournament_id, next_match_id=None).one()
+        finalist = final.player2_id if final.winner_id == final.player1_id else final.player1_id
+    admin_client.post(f'/tournament/{tournament_id}/archive', data={'remove_rows': '1'})
+    pop_flashes(admin_client)
+
+    # Участник снимка нужен для восстановления, обычное удаление его не удаляет
+    admin_client.post(f'/delete_user/{finalist}')
+    assert pop_flashes(admin_client)[0][0] == 'error'
+    admin_client.post('/admin/users/bulk', data={'action': 'delete', 'user_ids': [str(finalist)]})
+    pop_flashes(admin_client)
+
+    admin_client.post(f'/tournament/{tournament_id}/restore')
+    assert pop_flashes(admin_client) == [('success', 'Турнир восстановлен из архива')]
+    with app.app_context():
+        assert Match.query.filter_by(tournament_id=tournament_id).count() == 3
+        assert sorted(
+            user_id for (user_id,) in db.session.query(TournamentParticipant.user_id).filter_by(tournament_id=tournament_id)
+        ) == sorted(users)
+    assert_stats_match_rebuild(app)
+
+
+@pytest.mark.parametrize('group', [None, 'tag'])
+def test_leaderboard_win_rate_without_matches(app, make_users, create_tournament, play, group):
+    players = make_users(4, tag='Игроки')
+    newcomers = make_users(2, tag='Новички', prefix='Новичок')
+    play(create_tournament(players))
+    # Строки статистики без матчей остаются, например, после удаления турнира
+    with app.app_context():
+        db.session.add_all(UserStats(user_id=user_id, matches_played=0, wins=0, tournaments_won=0)
+                           for user_id in newcomers)
+        db.session.commit()
+
+    response = app.test_client().get('/api/leaderboard', query_string={
+        'sort': 'win_rate', 'min_matches': 0, **({'group': group} if group else {}),
+    })
+    assert response.status_code == 200
+    items = response.get_json()['items']
+    assert len(items) == (2 if group else 6)
+    rates = [item['win_rate'] for item in items]
+    assert rates == sorted(rates, reverse=True)
+    assert rates[-1] == 0.0
+
+
+@pytest.mark.parametrize('tournament_format', ['swiss', 'round_robin'])
+@pytest.mark.parametrize('last_pending', [False, True])
+def test_force_delete_keeps_standings_tournament_playable(app, admin_client, make_users, create_tournament, play,
+                                                          tournament_format, last_pending):
+    users = make_users(8)
+    tournament_id = create_tournament(users, tournament_format)
+    with app.app_context():
+        first_round = Match.query.filter_by(tournament_id=tournament_id, round_number=1).order_by(Match.id).all()
+        removed = first_round[-1].player1_id
+    # Либо удаляемый еще не сыграл в начатом туре, либо его матч - последний несыгранный в туре
+    play(tournament_id, limit=len(first_round) - 1 if last_pending else 2)
+
+    admin_client.post(f'/force_delete_user/{removed}', data={'confirm': 'DELETE_USER'})
+    assert pop_flashes(admin_client)[0][0] == 'warning'
+    with app.app_context():
+        tournament = db.session.get(Tournament, tournament_id)
+        assert tournament.status == 'active'
+        assert Match.query.filter_by(tournament_id=tournament_id, is_completed=False).count() > 0
+    assert_stats_match_rebuild(app)
+
+    assert play(tournament_id) > 0
+    with app.app_context():
+        tournament = db.session.get(Tournament, tournament_id)
+        assert tournament.status == 'completed'
+        assert tournament.winner_id is not None
+    assert_stats_match_rebuild(app)
+
+
+def test_walkover_final_gives_no_title(app, admin_client, make_users, create_tournament):
+    users = make_users(4)
+    tournament_id = create_tournament(users)
+    with app.app_context():
+        semifinals = [
+            (match.id, match.player1_id, match.player2_id)
+            for match in Match.query.filter_by(tournament_id=tournament_id, round_number=1).order_by(Match.position)
+        ]
+    (first, winner, _), (second, finalist, _) = semifinals
+    admin_client.post('/set_winner', data={'match_id': first, 'winner_id': winner})
+    pop_flashes(admin_client)
+    admin_client.post(f'/force_delete_user/{winner}', data={'confirm': 'DELETE_USER'})
+    pop_flashes(admin_client)
+
+    # Второй полуфинал завершает турнир: финал проходит без игры
+    admin_client.post('/set_winner', data={'match_id': second, 'winner_id': finalist})
+    pop_flashes(admin_client)
+    with app.app_context():
+        assert db.session.get(Tournament, tournament_id).status == 'completed'
+        assert db.session.get(UserStats, finalist).tournaments_won == 0
+    assert_stats_match_rebuild(app)
+
+
+def test_completed_legacy_bracket_rejects_results(app, admin_client, make_users, create_tournament):
+    users = make_users(6)
+    tournament_id = create_tournament(users)
+    # Сетка без слотов, как у турниров до advance_winner: раунды создаются пересчетом
+    with app.app_context():
+        Match.query.filter_by(tournament_id=tournament_id).delete()
+        db.session.add_all([
+            Match(tournament_id=tournament_id, round_number=1, player1_id=users[i], player2_id=users[i + 1])
+            for i in range(0, 6, 2)
+        ])
+        db.session.commit()
+        first_round = [
+            (match.id, match.player1_id)
+            for match in Match.query.filter_by(tournament_id=tournament_id).order_by(Match.id)
+        ]
+    for match_id, winner_id in first_round:
+        admin_client.post('/set_winner', data={'match_id': match_id, 'winner_id': winner_id})
+        assert all(category != 'error' for category, _ in pop_flashes(admin_client))
+
+    # Три победителя: старая логика создает полуфинал и сразу завершает турнир
+    with app.app_context():
+        assert db.session.get(Tournament, tournament_id).status == 'completed'
+        pending = Match.query.filter_by(tournament_id=tournament_id, is_completed=False).one()
+        pending_id, winner_id = pending.id, pending.player1_id
+        assert UserStats.query.filter(UserStats.tournaments_won > 0).count() == 0
+
+    admin_client.post('/set_winner', data={'match_id': pending_id, 'winner_id': winner_id})
+    assert pop_flashes(admin_client) == [('error', 'Турнир уже завершен!')]
+    response = admin_client.post(f'/tournament/{tournament_id}/results',
+                                 json={'results': [{'match_id': pending_id, 'winner_id': winner_id}]})
+    assert response.get_json()['applied'] == []
+    assert response.get_json()['errors'][0]['error'] == 'Турнир уже завершен'
+    assert_stats_match_rebuild(app)